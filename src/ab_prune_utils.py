@@ -1,128 +1,339 @@
-from typing import TYPE_CHECKING, Callable, Any
+from time import time
+from typing import TYPE_CHECKING, Callable
 from piece import Piece
+from transposition import TranspositionTable
+from move_ordering import MoveOrderer
+from search_stats import SearchStats
+from threat_solver import ThreatSolver
+from endgame import EndgameSolver
+from evaluation import ThreatEvaluator
 
 if TYPE_CHECKING:
     from board import Board
 
 class Move:
-    def __init__(self, board: 'Board | None', value: float):
-        self.board = board
-        self.value = value
-
-    def __hash__(self) -> int:
-        return hash(self.board)
-
-    def __eq__(self, o: object) -> bool:
-        return self.board == o
-
-MEMO: dict[tuple['Board', int], Move] = {}
-
-helper_type = Callable[['Board', float, float, int], tuple[Move, float, float]]
-return_type = Callable[['Board', float, float, int], Move]
-MOVES_MADE: list[tuple[Move, float, float, str]] = []
-
-def ab_prune_helper(helper: helper_type) -> return_type:
-
-    def wrapper(
-                board: 'Board',
-                alpha: float,
-                beta: float,
-                layers_remaining: int,
-            ) -> Move:
-
-        move, n_alpha, n_beta = helper(board, alpha, beta, layers_remaining)
-        MOVES_MADE.append((move, n_alpha, n_beta, helper.__name__))
+    """The position of a move, None for no move, and its value"""
 
-        return move
+    __slots__ = ("value", "position")
 
-    return wrapper
-
-def print_moves() -> None:
-    for move, alpha, beta, helper in sorted(MOVES_MADE, key=lambda x: len(repr(x[0].board))):
-        print(
-            f"Board {repr(move.board)} got {helper} {move.value} " +
-            f"({alpha}, {beta})"
-        )
-
-    MOVES_MADE.clear()
-
-@ab_prune_helper
-def max_value(
+    def __init__(self, value: float, position: int | None = None) -> None:
+        self.value = value
+        self.position = position
+
+# Search results keyed by the Zobrist key of a board, values are from the
+# point of view of the player to move
+TRANSPOSITION_TABLE = TranspositionTable()
+MOVE_ORDERER = MoveOrderer()
+THREAT_SOLVER = ThreatSolver()
+ENDGAME_SOLVER = EndgameSolver()
+
+def set_transposition_table(table: TranspositionTable) -> None:
+    """
+    Makes every search use table, such as a PersistentTranspositionTable
+
+    Other modules should reach the table through ab_prune_utils so they see
+    the replacement
+    """
+    global TRANSPOSITION_TABLE
+    TRANSPOSITION_TABLE = table
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its limits have run out"""
+
+class SearchLimits:
+    """
+    A deadline and node budget for a search, either can be None for no limit
+
+    The clock is only read every CHECK_INTERVAL nodes to keep checks cheap.
+    stop may be called from another thread to end the search early, which
+    also stops every share of the limits.
+    """
+
+    CHECK_INTERVAL = 256
+
+    def __init__(
+                self,
+                deadline: float | None = None,
+                node_budget: int | None = None,
+                parent: 'SearchLimits | None' = None
+            ) -> None:
+        self.deadline = deadline
+        self.node_budget = node_budget
+        self.nodes = 0
+        self.stopped = False
+        # The limits this is a share of, whose stop also stops this
+        self.parent = parent
+
+    def stop(self) -> None:
+        self.stopped = True
+
+    @property
+    def stop_requested(self) -> bool:
+        """Whether these limits or the ones they are a share of were stopped"""
+        return self.stopped or (self.parent is not None and self.parent.stopped)
+
+    def share(self, fraction: float) -> 'SearchLimits':
+        """
+        Limits for part of the search, with fraction of the time and nodes
+        that are left. Its nodes are not counted here, see add_nodes.
+        """
+        deadline = None
+        if self.deadline is not None:
+            now = time()
+            deadline = now + max(0.0, self.deadline - now) * fraction
+
+        node_budget = None
+        if self.node_budget is not None:
+            node_budget = int(max(0, self.node_budget - self.nodes) * fraction)
+
+        return SearchLimits(deadline, node_budget, self)
+
+    def add_nodes(self, count: int) -> None:
+        """Counts nodes searched under a share without checking the limits"""
+        self.nodes += count
+
+    def visit(self, count: int = 1) -> None:
+        """Counts count nodes, raising SearchTimeout once a limit is reached"""
+        previous = self.nodes
+        self.nodes += count
+
+        if self.stopped or (self.parent is not None and self.parent.stopped):
+            raise SearchTimeout("The search was stopped.")
+
+        if self.node_budget is not None and self.nodes > self.node_budget:
+            raise SearchTimeout("The node budget ran out.")
+
+        if (
+            self.deadline is not None and
+            previous // SearchLimits.CHECK_INTERVAL !=
+            self.nodes // SearchLimits.CHECK_INTERVAL and
+            time() >= self.deadline
+        ):
+            raise SearchTimeout("The deadline passed.")
+
+def search(
             board: 'Board',
-            alpha: float,
-            beta: float,
-            layers_remaining: int,
-        ) -> tuple[Move, float, float]:
-    # Determine a move that maximizes the value of the state
+            depth: int,
+            limits: SearchLimits | None = None
+        ) -> Move:
+    """
+    Searches the board to depth for the player to move
+
+    The returned Move holds the position of the best move and its value from
+    the point of view of the player to move. Raises SearchTimeout if the
+    limits run out, leaving the board as it was.
+    """
+    TRANSPOSITION_TABLE.new_search()
+    MOVE_ORDERER.new_search()
+    THREAT_SOLVER.new_search()
+
+    moves_played = len(board.history)
+    try:
+        return negamax(board, float('-inf'), float('inf'), depth, limits)
+    except SearchTimeout:
+        # Take back the moves of the abandoned search
+        while len(board.history) > moves_played:
+            board.undo_move()
+        raise
+
+search_type = Callable[['Board', int, SearchLimits | None], Move]
+
+def iterative_deepening(
+            board: 'Board',
+            max_time: float,
+            max_depth: int,
+            node_budget: int | None = None,
+            search_function: search_type = search,
+            limits: SearchLimits | None = None,
+            stats: SearchStats | None = None,
+            threat_plies: int | None = None,
+            endgame_empty: int | None = None
+        ) -> Move:
+    """
+    Searches one layer deeper at a time until max_time has passed or the
+    node budget is spent, returning the best move of the deepest search
+    that finished
+
+    Each layer is searched with search_function, which takes the same
+    arguments as search. Passing limits uses them instead of building them
+    from max_time and node_budget, so their node count can be read after.
+    Passing stats fills it in with the counts of every finished depth.
+
+    A forced win by threats within threat_plies is played without
+    searching, board.ROOT_THREAT_PLIES when None and 0 to always search.
+    The threat search gets board.ROOT_THREAT_SHARE of the time and nodes.
+    With at most endgame_empty empty cells, board.ENDGAME_EMPTY when None,
+    the position is solved exactly instead. The solve only gets
+    board.ENDGAME_SHARE of the time and nodes, and the search gets what is
+    left if the solve does not finish.
+    """
+    if limits is None:
+        limits = SearchLimits(time() + max_time, node_budget)
+
+    if threat_plies is None:
+        threat_plies = board.ROOT_THREAT_PLIES
+    if threat_plies:
+        start = time()
+        threat_limits = limits.share(board.ROOT_THREAT_SHARE)
+        line = THREAT_SOLVER.solve(board, threat_plies, limits=threat_limits)
+        limits.add_nodes(threat_limits.nodes)
+
+        if line is not None:
+            if stats is not None:
+                stats.threat_win = {
+                    "plies": len(line),
+                    "nodes": threat_limits.nodes,
+                    "elapsed": time() - start,
+                }
+            return Move(ThreatEvaluator.FORCED_WIN_VALUE, line[0])
+
+    if endgame_empty is None:
+        endgame_empty = board.ENDGAME_EMPTY
+    if board.count_empty() <= endgame_empty:
+        endgame_limits = limits.share(board.ENDGAME_SHARE)
+        result = ENDGAME_SOLVER.solve(board, endgame_limits)
+        limits.add_nodes(endgame_limits.nodes)
+
+        if result is not None:
+            if stats is not None:
+                stats.endgame = result.to_dict()
+            return Move(result.value, result.move)
+
+    best_move: Move | None = None
+    current_depth = 1
+    while current_depth <= max_depth:
+        start, nodes = time(), limits.nodes
+        tt_probes, tt_hits = TRANSPOSITION_TABLE.probes, TRANSPOSITION_TABLE.hits
+
+        try:
+            best_move = search_function(board, current_depth, limits)
+        except SearchTimeout:
+            if stats is not None:
+                stats.aborted = True
+            break
 
-    # A terminal state
-    if (winner:=board.check_winners()) != Piece.EMPTY or layers_remaining <= 0:
-        return Move(board, board.value_of(winner)), alpha, beta
-
-    best_move: Move = Move(board, float('-inf'))
-    for next_board in board.possible_moves:
-
-        min_value_res: Move | tuple[Move, float, float]
-        if (next_board, layers_remaining - 1) in MEMO:
-            min_value_res = MEMO[(next_board, layers_remaining - 1)]
-        else:
-            min_value_res = min_value(
-                next_board, alpha, beta, layers_remaining-1
+        if stats is not None:
+            stats.record_depth(
+                limits.nodes - nodes,
+                time() - start,
+                MOVE_ORDERER.cutoffs,
+                MOVE_ORDERER.first_move_cutoffs,
+                TRANSPOSITION_TABLE.probes - tt_probes,
+                TRANSPOSITION_TABLE.hits - tt_hits,
             )
-            MEMO[(next_board, layers_remaining-1)] = min_value_res
+        current_depth += 1
 
-        if isinstance(min_value_res, tuple):
-            min_value_res = min_value_res[0]
-        assert isinstance(min_value_res, Move)
+    if best_move is None:
+        # Always have a move to play, a single layer is quick to search
+        best_move = search(board, 1)
 
-        next_move = Move(next_board, min_value_res.value)
+    return best_move
 
-        best_move = max(best_move, next_move, key=lambda x: x.value)
-        alpha = max(alpha, best_move.value)
+def best_leaf(board: 'Board', limits: SearchLimits | None = None) -> Move:
+    """
+    The best move of a position whose children are all leaves, valued
+    together by board.BATCH_EVALUATOR
+    """
+    positions = list(board.candidate_moves)
+    if limits is not None:
+        limits.visit(len(positions))
 
-        if beta <= alpha:
-            break
+    position, value = board.BATCH_EVALUATOR.best(board, positions)
+    return Move(value, position)
 
-    return best_move, alpha, beta
-
-@ab_prune_helper
-def min_value(
+def negamax(
             board: 'Board',
             alpha: float,
             beta: float,
             layers_remaining: int,
-        ) -> tuple[Move, float, float]:
-
-    # Determine a move that minimizes the value of the state
+            limits: SearchLimits | None = None,
+        ) -> Move:
+    # Determine the move that is best for the player to move. The value of a
+    # board for one player is the negative of its value for the other, so
+    # both players can share the search.
+    # Each move is played on the given board and taken back afterwards, so no
+    # child boards are built.
+    if limits is not None:
+        limits.visit()
+
+    sign = 1 if board.turn == Piece.X else -1
 
     # A terminal state
-    if (winner:=board.check_winners()) != Piece.EMPTY or layers_remaining <= 0:
-        return Move(board, board.value_of(winner)), alpha, beta
-
-    best_move: Move = Move(board, float('inf'))
-    for next_board in board.possible_moves:
-
-        # Get the value of the next board
-        max_value_res: Move | tuple[Move, float, float]
-        if (next_board, layers_remaining - 1) in MEMO:
-            max_value_res = MEMO[(next_board, layers_remaining - 1)]
-        else:
-            max_value_res = max_value(
-                next_board, alpha, beta, layers_remaining-1
-            )
-            MEMO[(next_board, layers_remaining-1)] = max_value_res
+    if (
+        (winner:=board.check_winners()) != Piece.EMPTY or
+        layers_remaining <= 0 or
+        board.count_empty() == 0
+    ):
+        value = sign * board.value_of(winner)
+
+        # Extend quiet leaves with a search of threats only
+        if (
+            winner == Piece.EMPTY and
+            board.LEAF_THREAT_PLIES and
+            abs(value) < ThreatEvaluator.FORCED_WIN_VALUE and
+            THREAT_SOLVER.solve(
+                board, board.LEAF_THREAT_PLIES, board.LEAF_THREAT_NODES, limits
+            ) is not None
+        ):
+            value = ThreatEvaluator.FORCED_WIN_VALUE
+
+        TRANSPOSITION_TABLE.store(
+            board.table_key()[0], layers_remaining, value,
+            float('-inf'), float('inf')
+        )
+        return Move(value)
+
+    # Results are stored for one orientation of the board, moves are turned
+    # to and from it with the symmetry
+    key, symmetry = board.table_key()
+
+    # The children are all leaves, so they are valued together
+    if (
+        layers_remaining == 1 and
+        board.BATCH_EVALUATOR is not None and
+        not board.LEAF_THREAT_PLIES
+    ):
+        best_move = best_leaf(board, limits)
+        TRANSPOSITION_TABLE.store(
+            key, layers_remaining, best_move.value, alpha, beta,
+            board.to_canonical(best_move.position, symmetry)
+        )
+        return best_move
 
-        if isinstance(max_value_res, tuple):
-            max_value_res = max_value_res[0]
-        assert isinstance(max_value_res, Move)
+    # The best move found by the previous iteration is searched first
+    entry = TRANSPOSITION_TABLE.probe(key)
+    pv_move = None
+    if entry is not None:
+        pv_move = board.from_canonical(entry.best_move, symmetry)
 
-        next_move = Move(next_board, max_value_res.value)
+    alpha_original = alpha
+    best_value, best_position = float('-inf'), None
+    for move_index, position in enumerate(MOVE_ORDERER.order(board, pv_move)):
+
+        board.make_move(position)
+        next_value = TRANSPOSITION_TABLE.lookup(
+            board.table_key()[0], layers_remaining - 1, -beta, -alpha
+        )
+        if next_value is None:
+            next_value = negamax(
+                board, -beta, -alpha, layers_remaining-1, limits
+            ).value
+        board.undo_move()
 
         # Find the best of the moves
-        best_move = min(best_move, next_move, key=lambda x: x.value)
-        beta = min(beta, best_move.value)
+        if -next_value > best_value:
+            best_value, best_position = -next_value, position
+        alpha = max(alpha, best_value)
 
         if beta <= alpha:
+            MOVE_ORDERER.record_cutoff(
+                board, position, layers_remaining, move_index
+            )
             break
 
-    return best_move, alpha, beta
\ No newline at end of file
+    TRANSPOSITION_TABLE.store(
+        key, layers_remaining, best_value, alpha_original, beta,
+        board.to_canonical(best_position, symmetry)
+    )
+
+    return Move(best_value, best_position)
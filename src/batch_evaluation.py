@@ -0,0 +1,107 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from piece import Piece
+from evaluation import ThreatEvaluator, line_windows, window_scores
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional, without it every leaf is evaluated on its own
+    np = None
+
+if TYPE_CHECKING:
+    from board import Board
+
+HAS_NUMPY = np is not None
+
+class BatchEvaluator:
+    """
+    Values every child of a position in one go with NumPy, for the last ply
+    of a search
+
+    Each child differs from its parent by one piece, so the window counts of
+    all children are the parent's counts, kept by its ThreatEvaluator, plus
+    one row of the cell and window incidence matrix per child. Values match
+    Board.value_of for each child.
+    """
+
+    def __init__(self, dimensions: int, win: int) -> None:
+        cells = dimensions * dimensions
+        self.win = win
+
+        windows = line_windows(dimensions, win)
+        # 1 where a window holds a cell, shape (windows, cells)
+        self.window_masks = np.zeros((len(windows), cells), dtype=np.float32)
+        for window_ind, window in enumerate(windows):
+            self.window_masks[window_ind, list(window)] = 1
+        # The windows each cell is in, shape (cells, windows)
+        self.cell_windows = self.window_masks.T.astype(np.int64)
+
+        # Indexed by X count times (win + 1) plus O count, like window_scores
+        self.scores = np.array(window_scores(win), dtype=np.int64).ravel()
+
+    def _cells(self, bits: int) -> np.ndarray:
+        """A bool per cell, set where bits is set"""
+        return np.unpackbits(
+            np.array([bits], dtype="<u8").view(np.uint8), bitorder="little"
+        )[:self.window_masks.shape[1]].astype(bool)
+
+    def best(self, board: Board, positions: list[int]) -> tuple[int, int]:
+        """
+        The first of the best positions for the player to move and its value
+        from their point of view
+        """
+        sign = 1 if board.turn == Piece.X else -1
+        values = sign * self._values(board, positions)
+
+        best_ind = int(values.argmax())
+        return positions[best_ind], int(values[best_ind])
+
+    def values(self, board: Board, positions: list[int]) -> list[int]:
+        """
+        The value from X's point of view of each position after the player
+        to move plays there
+        """
+        return self._values(board, positions).tolist()
+
+    def _values(self, board: Board, positions: list[int]) -> np.ndarray:
+        turn = board.turn
+        evaluator = board.evaluator
+        player_counts, opponent_counts = (
+            (evaluator.x_counts, evaluator.o_counts) if turn == Piece.X
+            else (evaluator.o_counts, evaluator.x_counts)
+        )
+
+        # Pieces in every window, shape (children, windows) for the player
+        # who moves and (windows,) for the opponent, who moves next
+        players = np.array(player_counts) + self.cell_windows[positions]
+        opponents = np.array(opponent_counts)
+
+        x_counts, o_counts = (
+            (players, opponents) if turn == Piece.X else (opponents, players)
+        )
+        values = self.scores[x_counts * (self.win + 1) + o_counts].sum(axis=1)
+
+        threat = self.win - 1
+        opponent_threats = ((opponents == threat) & (players == 0)).any(axis=1)
+        player_threats = ((players == threat) & (opponents == 0)).astype(np.float32)
+
+        # The empty cells of the player's threat windows, only one can be
+        # blocked
+        player_cells = (player_threats @ self.window_masks > 0) & ~self._cells(
+            board.x_bits if turn == Piece.X else board.o_bits
+        )
+        player_cells[np.arange(len(positions)), positions] = False
+        double_threats = player_cells.sum(axis=1) >= 2
+
+        sign = 1 if turn == Piece.X else -1
+        forced_win = ThreatEvaluator.FORCED_WIN_VALUE
+        values = np.where(double_threats, sign * forced_win, values)
+        values = np.where(opponent_threats, -sign * forced_win, values)
+
+        if board.count_empty() == 1:
+            values[:] = board.TIE_VALUE
+
+        # Only the player who moves can have made a line
+        won = board.WIN_VALUE if turn == Piece.X else board.LOSE_VALUE
+        return np.where((players == self.win).any(axis=1), won, values)
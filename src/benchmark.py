@@ -0,0 +1,308 @@
+from __future__ import annotations
+import json
+import re
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Any, Iterator
+from piece import Piece
+from board import Board
+import ab_prune_utils
+from ab_prune_utils import (
+    MOVE_ORDERER, Move, iterative_deepening, set_transposition_table
+)
+from persistent_table import PersistentTranspositionTable
+from search_stats import SearchStats
+from game_record import GameArchive
+from move_cache import board_size
+
+BENCH_DIR = Path(__file__).resolve().parent.parent / "bench"
+POSITIONS_PATH = BENCH_DIR / "positions.json"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+# A run fails when its overall nodes per second drop by more than this share
+DEFAULT_SLOWDOWN = 0.25
+
+def transcript_moves(path: str | Path) -> tuple[Piece, list[str]]:
+    """
+    The starting player and moves of a game transcript such as
+    output/computer_win.txt, skipping moves that were rejected
+    """
+    text = Path(path).read_text()
+
+    starter = Piece.O if re.search(r"start\? \(y/n\): y", text) else Piece.X
+    board = Board(starter)
+
+    moves: list[str] = []
+    for line in text.splitlines():
+        if not (match:=re.fullmatch(r"(?:[XO]'s turn: )?([A-Ha-h][1-8])", line.strip())):
+            continue
+        if board.check_winners() != Piece.EMPTY:
+            break
+
+        try:
+            board.play_moves(match.group(1))
+        except ValueError:
+            continue
+        moves.append(match.group(1).upper())
+
+    return starter, moves
+
+def game_moves(path: str | Path) -> Iterator[tuple[str, Piece, list[str]]]:
+    """
+    The name, starting player and moves of each game in a transcript or a
+    game archive, see game_record
+    """
+    if not GameArchive.is_archive(path):
+        starter, moves = transcript_moves(path)
+        yield Path(path).stem, starter, moves
+        return
+
+    for game_index, record in enumerate(GameArchive.read(path)):
+        yield (
+            f"{Path(path).stem}-{game_index}",
+            record.starter,
+            [Board.identifier_of(position) for position in record.moves],
+        )
+
+def extract_positions(
+            paths: list[str],
+            every: int,
+            depth: int
+        ) -> list[dict[str, Any]]:
+    """Positions from every every'th move of each game in the files"""
+    positions: list[dict[str, Any]] = []
+    for path in paths:
+        for name, starter, moves in game_moves(path):
+            for ply in range(0, len(moves), every):
+                positions.append({
+                    "name": f"{name}-{ply}",
+                    "starter": str(starter),
+                    "moves": " ".join(moves[:ply]),
+                    "depth": depth,
+                })
+    return positions
+
+def run_position(
+            position: dict[str, Any],
+            clear_table: bool = True
+        ) -> dict[str, Any]:
+    """Searches a position one depth at a time with empty caches"""
+    if clear_table:
+        ab_prune_utils.TRANSPOSITION_TABLE.clear()
+    MOVE_ORDERER.clear()
+
+    board = Board(Piece.X if position["starter"] == "X" else Piece.O)
+    board.play_moves(position["moves"])
+
+    stats = SearchStats()
+    # Always search, the benchmark times the main search
+    best_move = iterative_deepening(
+        board, float('inf'), position["depth"], stats=stats,
+        threat_plies=0, endgame_empty=0
+    )
+
+    time_to_depth: list[float] = []
+    for seconds in stats.time_per_depth:
+        time_to_depth.append(seconds + (time_to_depth[-1] if time_to_depth else 0))
+
+    identifier = None
+    if best_move.position is not None:
+        identifier = Board.identifier_of(best_move.position)
+
+    return {
+        "name": position["name"],
+        "depth": position["depth"],
+        "nodes": stats.nodes,
+        "nodes_per_second": stats.nodes / stats.elapsed if stats.elapsed else 0.0,
+        "time_to_depth": time_to_depth,
+        "tt_hit_rate": stats.tt_hit_rate,
+        "branching_factor": stats.branching_factor,
+        "first_move_cutoff_rate": stats.first_move_cutoff_rate,
+        "best_move": identifier,
+        "value": best_move.value,
+    }
+
+def measure_memory(position: dict[str, Any]) -> dict[str, Any]:
+    """
+    Searches a position like run_position while tracing allocations
+
+    The peak is the most memory the search held at once above what was held
+    before it, and the retained memory is what it still holds afterwards,
+    mostly transposition table entries
+    """
+    # Clearing reallocates the table's slots, which is not per node
+    ab_prune_utils.TRANSPOSITION_TABLE.clear()
+
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = run_position(position, clear_table=False)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    nodes = max(result["nodes"], 1)
+    return {
+        "name": position["name"],
+        "nodes": result["nodes"],
+        "peak_bytes": peak - start,
+        "retained_bytes": current - start,
+        "peak_bytes_per_node": (peak - start) / nodes,
+        "retained_bytes_per_node": (current - start) / nodes,
+    }
+
+def object_sizes() -> dict[str, int]:
+    """
+    The bytes of an empty Board, with the evaluator and lists it owns, and
+    of a Move
+    """
+    return {
+        "Board": board_size(Board(Piece.X)),
+        "Move": sys.getsizeof(Move(0, 0)),
+    }
+
+def print_memory(results: list[dict[str, Any]]) -> None:
+    print(
+        f"{'position':<22} {'nodes':>9} {'peak KiB':>9} {'B/node':>8} " +
+        f"{'kept B/node':>11}"
+    )
+    for result in results:
+        print(
+            f"{result['name']:<22} {result['nodes']:>9} " +
+            f"{result['peak_bytes'] / 1024:>9.1f} " +
+            f"{result['peak_bytes_per_node']:>8.0f} " +
+            f"{result['retained_bytes_per_node']:>11.0f}"
+        )
+
+    nodes = sum(result["nodes"] for result in results) or 1
+    print(
+        f"Overall {sum(result['peak_bytes'] for result in results) / nodes:.0f} " +
+        f"peak bytes/node, " +
+        f"{sum(result['retained_bytes'] for result in results) / nodes:.0f} " +
+        f"kept bytes/node"
+    )
+    print(", ".join(f"{name} {size} bytes" for name, size in object_sizes().items()))
+
+def overall_speed(results: list[dict[str, Any]]) -> float:
+    """Nodes per second over the whole run, steadier than any one position"""
+    elapsed = sum(result["time_to_depth"][-1] for result in results)
+    if not elapsed:
+        return 0.0
+    return sum(result["nodes"] for result in results) / elapsed
+
+def compare(
+            results: list[dict[str, Any]],
+            baseline: list[dict[str, Any]],
+            max_slowdown: float
+        ) -> list[str]:
+    """Describes every regression of results against the baseline"""
+    baseline_by_name = {result["name"]: result for result in baseline}
+
+    failures: list[str] = []
+    for result in results:
+        if (previous:=baseline_by_name.get(result["name"])) is None:
+            continue
+
+        if result["best_move"] != previous["best_move"]:
+            failures.append(
+                f"{result['name']}: best move changed from " +
+                f"{previous['best_move']} to {result['best_move']}"
+            )
+
+    previous_speed = overall_speed(baseline)
+    speed = overall_speed(results)
+    if previous_speed and speed:
+        slowdown = previous_speed / speed - 1
+        if slowdown > max_slowdown:
+            failures.append(
+                f"{slowdown:.0%} slower overall " +
+                f"({previous_speed:.0f} to {speed:.0f} nodes/s)"
+            )
+
+    return failures
+
+def print_results(results: list[dict[str, Any]]) -> None:
+    print(
+        f"{'position':<22} {'depth':>5} {'nodes':>9} {'nodes/s':>9} " +
+        f"{'time':>8} {'tt hits':>7} {'move':>5}"
+    )
+    for result in results:
+        print(
+            f"{result['name']:<22} {result['depth']:>5} " +
+            f"{result['nodes']:>9} {result['nodes_per_second']:>9.0f} " +
+            f"{result['time_to_depth'][-1]:>7.3f}s " +
+            f"{result['tt_hit_rate']:>7.1%} {str(result['best_move']):>5}"
+        )
+
+def main(argv: list[str] | None = None) -> int:
+    parser = ArgumentParser(description="Benchmarks the search on fixed positions.")
+    parser.add_argument("--positions", default=str(POSITIONS_PATH))
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument(
+        "--update-baseline", action="store_true",
+        help="Store this run as the new baseline instead of comparing"
+    )
+    parser.add_argument("--max-slowdown", type=float, default=DEFAULT_SLOWDOWN)
+    parser.add_argument("--output", help="Also write the results as JSON here")
+    parser.add_argument(
+        "--extract", nargs="+", metavar="GAMES",
+        help="Rebuild the positions file from game transcripts or archives and exit"
+    )
+    parser.add_argument(
+        "--table", metavar="PATH",
+        help="Search with a persistent transposition table, kept between runs"
+    )
+    parser.add_argument(
+        "--memory", action="store_true",
+        help="Report the bytes allocated per searched node instead of timing"
+    )
+    parser.add_argument("--every", type=int, default=6)
+    parser.add_argument("--depth", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if args.extract:
+        positions = extract_positions(args.extract, args.every, args.depth)
+        Path(args.positions).write_text(json.dumps(positions, indent=4) + "\n")
+        print(f"Wrote {len(positions)} positions to {args.positions}")
+        return 0
+
+    positions = json.loads(Path(args.positions).read_text())
+    if args.table:
+        set_transposition_table(PersistentTranspositionTable(args.table))
+
+    if args.memory:
+        print_memory([measure_memory(position) for position in positions])
+        return 0
+
+    results = [
+        run_position(position, clear_table=not args.table)
+        for position in positions
+    ]
+    print_results(results)
+    print(f"Overall {overall_speed(results):.0f} nodes/s")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=4) + "\n")
+
+    if args.update_baseline:
+        Path(args.baseline).write_text(json.dumps(results, indent=4) + "\n")
+        print(f"Stored the baseline in {args.baseline}")
+        return 0
+
+    if not Path(args.baseline).exists():
+        print(f"No baseline at {args.baseline}, run with --update-baseline")
+        return 0
+
+    failures = compare(
+        results, json.loads(Path(args.baseline).read_text()), args.max_slowdown
+    )
+    for failure in failures:
+        print("FAIL", failure)
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
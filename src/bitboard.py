@@ -0,0 +1,107 @@
+from functools import lru_cache
+from typing import Iterator
+
+def position_of(letter: int, index: int, dimensions: int) -> int:
+    """The bit position of a cell, counted row by row from the top left"""
+    return letter * dimensions + index
+
+def coordinates_of(position: int, dimensions: int) -> tuple[int, int]:
+    """The (letter, index) pair of a bit position"""
+    return divmod(position, dimensions)
+
+def full_mask(dimensions: int) -> int:
+    """A mask with a bit set for every cell of the board"""
+    return (1 << (dimensions * dimensions)) - 1
+
+def iterate_bits(bits: int) -> Iterator[int]:
+    """Yields the position of every set bit, lowest first"""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+def count_bits(bits: int) -> int:
+    return bits.bit_count()
+
+def line_directions(
+            dimensions: int,
+            win: int,
+            diagonals: bool = False
+        ) -> list[tuple[int, int]]:
+    """
+    Pairs of (shift, start mask) for every direction a line can run in
+
+    A line of win cells in a direction starts on a bit in the start mask and
+    continues every shift bits, so the mask keeps lines from wrapping around
+    the edge of the board
+    """
+    def starts(row_limit: range, col_limit: range) -> int:
+        mask = 0
+        for row in row_limit:
+            for col in col_limit:
+                mask |= 1 << position_of(row, col, dimensions)
+        return mask
+
+    every = range(dimensions)
+    before_end = range(dimensions - win + 1)
+    after_start = range(win - 1, dimensions)
+
+    directions = [
+        (1, starts(every, before_end)),
+        (dimensions, starts(before_end, every)),
+    ]
+    if diagonals:
+        directions.append((dimensions + 1, starts(before_end, before_end)))
+        directions.append((dimensions - 1, starts(before_end, after_start)))
+
+    return directions
+
+def has_line(bits: int, win: int, directions: list[tuple[int, int]]) -> bool:
+    """Whether win consecutive bits are set in any of the directions"""
+    for shift, mask in directions:
+        line = bits & mask
+        for step in range(1, win):
+            line &= bits >> (shift * step)
+        if line:
+            return True
+
+    return False
+
+def line_cells(bits: int, win: int, directions: list[tuple[int, int]]) -> int:
+    """A mask of every cell in a line of win consecutive set bits"""
+    cells = 0
+    for shift, mask in directions:
+        line = bits & mask
+        for step in range(1, win):
+            line &= bits >> (shift * step)
+        for step in range(win):
+            cells |= line << (shift * step)
+
+    return cells
+
+@lru_cache
+def edge_masks(dimensions: int) -> tuple[int, int]:
+    """Masks of every cell outside the first and outside the last column"""
+    first_column = 0
+    for row in range(dimensions):
+        first_column |= 1 << position_of(row, 0, dimensions)
+    last_column = first_column << (dimensions - 1)
+
+    everything = full_mask(dimensions)
+    return everything & ~first_column, everything & ~last_column
+
+def neighbours(bits: int, dimensions: int, distance: int = 1) -> int:
+    """
+    The unset cells within distance steps of a set cell, diagonal steps
+    included
+    """
+    not_first, not_last = edge_masks(dimensions)
+    everything = full_mask(dimensions)
+
+    spread = bits
+    for _ in range(distance):
+        spread |= ((spread & not_first) >> 1) | ((spread & not_last) << 1)
+        spread |= (spread << dimensions) | (spread >> dimensions)
+        spread &= everything
+
+    return spread & ~bits
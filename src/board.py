@@ -1,9 +1,21 @@
 from __future__ import annotations
-from time import time
 from piece import Piece
-from ab_prune_utils import max_value, min_value, print_moves
-from ordered_set import OrderedSet
+from ab_prune_utils import SearchLimits, search, iterative_deepening
+from search_stats import SearchStats
+from bitboard import (
+    position_of, coordinates_of, full_mask, iterate_bits, count_bits,
+    line_directions, has_line, neighbours
+)
+from zobrist import ZobristKeys
+from symmetry import symmetry_permutations, inverse_permutations, transform_bits
+from move_cache import MoveCache
+from evaluation import ThreatEvaluator
+from batch_evaluation import HAS_NUMPY, BatchEvaluator
+from parallel_search import get_searcher
+from opening_book import DEFAULT_BOOK_PATH, OpeningBook
+from game_record import DEFAULT_RECORD_PATH, record_game
 from random import shuffle
+from typing import Iterator
 
 class Board:
 
@@ -11,39 +23,104 @@ class Board:
     WIN = 4
     MAX_TIME = 4
     MAX_DEPTH = 5
-    POSSIBLE_MOVES_CACHE: dict[Board, list[Board]] = {}
+    # Nodes a single move may search, None for no limit
+    NODE_BUDGET: int | None = None
+    # Processes searching the root moves, 1 searches in this process only
+    WORKERS = 1
+    # Print the statistics of every search as JSON
+    COLLECT_STATS = False
+    # Mapped once at startup, None when there is no book file
+    OPENING_BOOK = OpeningBook.load(DEFAULT_BOOK_PATH)
+    # Games played by the game loops are appended here, None keeps no record
+    RECORD_PATH = DEFAULT_RECORD_PATH
+    POSSIBLE_MOVES_CACHE = MoveCache()
+    FULL_MASK = full_mask(DIMENSIONS)
+    # Lines only count along rows and columns
+    LINE_DIRECTIONS = line_directions(DIMENSIONS, WIN)
+    ZOBRIST = ZobristKeys(DIMENSIONS * DIMENSIONS)
+    SYMMETRY_PERMUTATIONS = symmetry_permutations(DIMENSIONS)
+    INVERSE_PERMUTATIONS = inverse_permutations(DIMENSIONS)
+    SYMMETRIC_X_KEYS, SYMMETRIC_O_KEYS = ZOBRIST.symmetric_keys(
+        SYMMETRY_PERMUTATIONS
+    )
+    # Share search results between rotations and reflections of a position.
+    # Symmetric keys are only kept up to SYMMETRY_PIECES pieces, after that
+    # positions are rarely symmetric to one another and the upkeep costs more
+    # than it saves.
+    USE_SYMMETRY = True
+    SYMMETRY_PIECES = 16
+    # The search only plays cells this close to a piece, None plays anywhere
+    CANDIDATE_DISTANCE: int | None = 2
+    # Plies of the threat search before the main search and at its leaves,
+    # 0 turns it off, see ThreatSolver. At the leaves it is several times
+    # slower per node, so it is off unless asked for.
+    ROOT_THREAT_PLIES = 25
+    # Share of a move's time and nodes the threat search before it may use
+    ROOT_THREAT_SHARE = 0.5
+    LEAF_THREAT_PLIES = 0
+    LEAF_THREAT_NODES = 200
+    # Positions with at most this many empty cells are solved exactly
+    # instead of searched, see EndgameSolver, 0 turns it off
+    ENDGAME_EMPTY = 10
+    # Share of a move's time and nodes the solve may use before the search
+    # takes over
+    ENDGAME_SHARE = 0.5
+    # Value the children of the last ply together when NumPy is installed
+    BATCH_EVALUATOR = BatchEvaluator(DIMENSIONS, WIN) if HAS_NUMPY else None
+    # Values of a finished game from X's point of view
+    WIN_VALUE = 100_000
+    LOSE_VALUE = -100_00
+    TIE_VALUE = 0
+    # Turn orders by starting player, shared by every board
+    ORDERS = {
+        Piece.X: (Piece.X, Piece.O),
+        Piece.O: (Piece.O, Piece.X),
+    }
+
+    __slots__ = (
+        "x_bits", "o_bits", "history", "evaluator", "order", "turn_count",
+        "key", "symmetric_keys", "_canonical", "last_stats",
+    )
 
     def __init__(self, starter: Piece) -> None:
-        self.board: list[list[Piece]] = [
-            [Piece.EMPTY for _ in range(Board.DIMENSIONS)]
-            for _ in range(Board.DIMENSIONS)
-        ]
+        # One bit per cell for each player, see bitboard.position_of
+        self.x_bits = 0
+        self.o_bits = 0
+        self.history: list[int] = []
+        self.evaluator = ThreatEvaluator(Board.DIMENSIONS, Board.WIN)
 
-        self.parent: Board | None = None
         self.set_starter(starter)
         self.turn_count = 0
 
-        self.moves_identifier = ""
+        # Zobrist key of the position, updated on every move
+        self.key = Board.ZOBRIST.key_of(0, 0, starter == Piece.O)
+        # Keys of the position under each symmetry, kept up to SYMMETRY_PIECES
+        self.symmetric_keys = [self.key] * len(Board.SYMMETRY_PERMUTATIONS)
+        self._canonical: tuple[int, int] | None = None
 
-    def _assign_parent(self, parent: Board) -> None:
-        if self.parent:
-            raise ValueError("Board already has a parent")
-        self.parent = parent
+        # Statistics of the last computer_move, when Board.COLLECT_STATS is on
+        self.last_stats: SearchStats | None = None
 
     @classmethod
     def from_board(cls, board: Board, simulate: bool = True) -> Board:
-        next_board = cls(board.order[0])
-
         if simulate:
-            next_board.play_moves(board.moves_identifier.rstrip())
-        else:
-            for row_ind, row in enumerate(board.board):
-                for col_ind, piece in enumerate(row):
-                    if piece != Piece.EMPTY:
-                        next_board.turn_count += 1
-                        next_board.board[row_ind][col_ind] = piece
-
-            next_board.moves_identifier = board.moves_identifier
+            next_board = cls(board.order[0])
+            for position in board.history:
+                next_board.make_move(position)
+            return next_board
+
+        # Copies the state without building a new evaluator to replace
+        next_board = cls.__new__(cls)
+        next_board.x_bits = board.x_bits
+        next_board.o_bits = board.o_bits
+        next_board.history = board.history.copy()
+        next_board.evaluator = board.evaluator.copy()
+        next_board.order = board.order
+        next_board.turn_count = board.turn_count
+        next_board.key = board.key
+        next_board.symmetric_keys = board.symmetric_keys.copy()
+        next_board._canonical = board._canonical
+        next_board.last_stats = None
 
         return next_board
 
@@ -53,13 +130,25 @@ class Board:
 
         for row_ind, row in enumerate(matrix):
             for col_ind, piece in enumerate(row):
-                next_board.board[row_ind][col_ind] = piece
-                next_board.turn_count += (1 if piece != Piece.EMPTY else 0)
+                if piece == Piece.EMPTY:
+                    continue
+
+                position = position_of(row_ind, col_ind, Board.DIMENSIONS)
+                if piece == Piece.X:
+                    next_board.x_bits |= 1 << position
+                else:
+                    next_board.o_bits |= 1 << position
+                next_board.evaluator.place(position, piece)
+                next_board.turn_count += 1
+
+        next_board.symmetric_keys = next_board._compute_symmetric_keys()
+        next_board.key = next_board.symmetric_keys[0]
 
         return next_board
 
     def test_piece(self, letter: int | str, index: int) -> Board:
-        next_board = Board.from_board(self)
+        # Copying the bitboards is cheaper than replaying every move
+        next_board = Board.from_board(self, simulate=False)
 
         next_board.place_piece(letter, index)
 
@@ -67,22 +156,20 @@ class Board:
 
     @property
     def possible_moves(self) -> list[Board]:
-        if self in Board.POSSIBLE_MOVES_CACHE:
-            # shuffle(Board.POSSIBLE_MOVES_CACHE[self])
-            return Board.POSSIBLE_MOVES_CACHE[self]
+        if (cached:=Board.POSSIBLE_MOVES_CACHE.get(self)) is not None:
+            # shuffle(cached)
+            return cached
 
         possible_moves: list[Board] = []
 
-        for row_ind, row in enumerate(self.board):
-            for col_ind in range(len(row)):
-                if self.board[row_ind][col_ind] != Piece.EMPTY:
-                    continue
-
-                possible_moves.append(self.test_piece(row_ind, col_ind))
+        for position in self.empty_squares:
+            possible_moves.append(
+                self.test_piece(*coordinates_of(position, Board.DIMENSIONS))
+            )
 
         # shuffle(possible_moves)
 
-        Board.POSSIBLE_MOVES_CACHE[self] = possible_moves
+        Board.POSSIBLE_MOVES_CACHE.put(self, possible_moves)
 
         return possible_moves
 
@@ -91,20 +178,167 @@ class Board:
         """Calculates whose turn it is"""
         return self.order[self.turn_count % 2]
 
-    def difference(self, other: Board) -> list[str]:
-        our_moves = OrderedSet(self.moves_identifier.strip().split(" "))
-        other_moves = OrderedSet(other.moves_identifier.strip().split(" "))
+    # BITBOARD STATE
+    @property
+    def occupied(self) -> int:
+        return self.x_bits | self.o_bits
+
+    @property
+    def empty_squares(self) -> Iterator[int]:
+        """Yields the position of every empty cell in row-major order"""
+        return iterate_bits(~self.occupied & Board.FULL_MASK)
 
-        # print(f"Current Moves {our_moves}")
-        # print(f"Next Moves {other_moves}")
-        # print(f"Differences {list(other_moves - our_moves)}")
+    @property
+    def candidate_moves(self) -> Iterator[int]:
+        """
+        Yields the moves worth searching in row-major order
 
-        return list(other_moves - our_moves)
+        A move that wins now or blocks the opponent's line is forced, so only
+        those are given when there are any. Otherwise only cells within
+        Board.CANDIDATE_DISTANCE of a piece are given, as cells further away
+        can't take part in a line within a few moves.
+        """
+        occupied = self.occupied
+        if Board.CANDIDATE_DISTANCE is None or not occupied:
+            return self.empty_squares
+
+        turn = self.turn
+        if wins:=self.evaluator.threat_cells(turn, occupied):
+            return iterate_bits(wins)
+        if blocks:=self.evaluator.threat_cells(Piece.other(turn), occupied):
+            return iterate_bits(blocks)
+
+        return iterate_bits(
+            neighbours(occupied, Board.DIMENSIONS, Board.CANDIDATE_DISTANCE)
+        )
+
+    @property
+    def board(self) -> list[list[Piece]]:
+        """The board as a matrix of Pieces, built from the bitboards"""
+        return [
+            [self.piece_at(row_ind, col_ind) for col_ind in range(Board.DIMENSIONS)]
+            for row_ind in range(Board.DIMENSIONS)
+        ]
+
+    # SYMMETRY
+    def _compute_symmetric_keys(self) -> list[int]:
+        return [
+            Board.ZOBRIST.key_of(
+                transform_bits(self.x_bits, symmetry, Board.DIMENSIONS),
+                transform_bits(self.o_bits, symmetry, Board.DIMENSIONS),
+                self.turn == Piece.O
+            )
+            for symmetry in range(len(Board.SYMMETRY_PERMUTATIONS))
+        ]
+
+    def _update_symmetric_keys(self, move_keys: tuple[int, ...]) -> None:
+        # Called with the piece count before a move and after an undo, so
+        # skipped updates are skipped in pairs and the keys stay right for
+        # every position up to SYMMETRY_PIECES
+        self._canonical = None
+        if self.turn_count >= Board.SYMMETRY_PIECES:
+            return
+        self.symmetric_keys = [
+            key ^ move_key
+            for key, move_key in zip(self.symmetric_keys, move_keys)
+        ]
+
+    def canonical(self) -> tuple[int, int]:
+        """
+        The smallest key of the position under any symmetry, and the
+        symmetry that gives it
+
+        Every rotation and reflection of a position has the same canonical
+        key, moves are moved between them with to_canonical and
+        from_canonical
+        """
+        if self._canonical is None:
+            symmetric_keys = self.symmetric_keys
+            if self.turn_count > Board.SYMMETRY_PIECES:
+                symmetric_keys = self._compute_symmetric_keys()
+            key = min(symmetric_keys)
+            self._canonical = key, symmetric_keys.index(key)
+        return self._canonical
+
+    def table_key(self) -> tuple[int, int]:
+        """
+        The key and symmetry to cache search results under, canonical for
+        positions with up to SYMMETRY_PIECES pieces
+        """
+        if Board.USE_SYMMETRY and self.turn_count <= Board.SYMMETRY_PIECES:
+            return self.canonical()
+        return self.key, 0
+
+    @staticmethod
+    def to_canonical(position: int | None, symmetry: int) -> int | None:
+        if position is None:
+            return None
+        return Board.SYMMETRY_PERMUTATIONS[symmetry][position]
+
+    @staticmethod
+    def from_canonical(position: int | None, symmetry: int) -> int | None:
+        if position is None:
+            return None
+        return Board.INVERSE_PERMUTATIONS[symmetry][position]
+
+    def piece_at(self, letter: int, index: int) -> Piece:
+        bit = 1 << position_of(letter, index, Board.DIMENSIONS)
+        if self.x_bits & bit:
+            return Piece.X
+        if self.o_bits & bit:
+            return Piece.O
+        return Piece.EMPTY
+
+    def make_move(self, position: int) -> None:
+        """
+        Places a piece at a bit position for the current player
+
+        Does no validation, use place_piece for untrusted input
+        """
+        if (turn:=self.turn) == Piece.X:
+            self.x_bits |= 1 << position
+            self.key ^= Board.ZOBRIST.x_keys[position]
+            symmetric_keys = Board.SYMMETRIC_X_KEYS[position]
+        else:
+            self.o_bits |= 1 << position
+            self.key ^= Board.ZOBRIST.o_keys[position]
+            symmetric_keys = Board.SYMMETRIC_O_KEYS[position]
+        self.evaluator.place(position, turn)
+
+        self.key ^= Board.ZOBRIST.turn_key
+        self._update_symmetric_keys(symmetric_keys)
+        self.turn_count += 1
+        self.history.append(position)
+
+    def undo_move(self) -> int:
+        """Takes back the last move played and returns its position"""
+        position = self.history.pop()
+        self.turn_count -= 1
+
+        if (turn:=self.turn) == Piece.X:
+            self.x_bits &= ~(1 << position)
+            self.key ^= Board.ZOBRIST.x_keys[position]
+            symmetric_keys = Board.SYMMETRIC_X_KEYS[position]
+        else:
+            self.o_bits &= ~(1 << position)
+            self.key ^= Board.ZOBRIST.o_keys[position]
+            symmetric_keys = Board.SYMMETRIC_O_KEYS[position]
+        self.evaluator.remove(position, turn)
+
+        self.key ^= Board.ZOBRIST.turn_key
+        self._update_symmetric_keys(symmetric_keys)
+
+        return position
+
+    @property
+    def moves_identifier(self) -> str:
+        """The moves played as space separated identifiers, such as 'D4 E5'"""
+        return " ".join(map(Board.identifier_of, self.history))
 
     # GAMEPLAY
     def set_starter(self, piece: Piece) -> None:
         """Sets the order of players"""
-        self.order = [piece, Piece.other(piece)]
+        self.order = Board.ORDERS[piece]
 
     def place_piece(self, letter: int | str, index: int) -> None:
         """
@@ -115,115 +349,89 @@ class Board:
         if isinstance(letter, str):
             letter = Board._translate_to_index(letter)
 
-        self.board[letter][index] = self.turn
+        # Validates the letter and index
+        self._translate_to_identifier(letter, index)
 
-        self.turn_count += 1
-        self.moves_identifier += (
-            self._translate_to_identifier(letter, index) + " "
-        )
+        if self.piece_at(letter, index) != Piece.EMPTY:
+            raise ValueError("That spot is already filled.")
+
+        self.make_move(position_of(letter, index, Board.DIMENSIONS))
 
     def gameplay_loop(self) -> None:
+        Board.POSSIBLE_MOVES_CACHE.clear()
+
         while (winner:=self.check_winners()) == Piece.EMPTY and self.count_empty() != 0:
             print(self)
 
-            letter: int | str | None = None
-            index: int | None = None
             if self.turn == Piece.O:
-                letter, index = self._get_user_input()
+                self.place_piece(*self._get_user_input())
             else:
-                print(f"{self.turn}'s turn... ")
-
-                start = time()
-                end = time()
-
-                max_value: float = float('-inf')
-                current_depth = 1
-                while end - start < Board.MAX_TIME and current_depth <= Board.MAX_DEPTH:
-                    (curr_letter, curr_index), value = self.alpha_beta_max_search(
-                        current_depth
-                    )
-
-                    if value > max_value:
-                        letter, index = curr_letter, curr_index
-
-                    current_depth += 1
-
-                    end = time()
-
-                assert letter is not None and index is not None
-
-                print(letter, index+1, sep="")
-                # print(
-                #     f"Reached Depth {current_depth - 1} in {(time() - start):4f}s"
-                # )
-
-                # print_moves()
-
-            self.place_piece(letter, index)
+                self.make_move(self.computer_move())
 
+        record_game(self, Board.RECORD_PATH)
         print(self)
         print("Winner:", winner)
 
     def lonely_loop(self) -> None:
+        Board.POSSIBLE_MOVES_CACHE.clear()
+
         while (winner:=self.check_winners()) == Piece.EMPTY and self.count_empty() != 0:
             print(self)
 
-            letter: int | str | None = None
-            index: int | None = None
-            if self.turn == Piece.O:
-                print(f"{self.turn}'s turn... ")
-
-                start = time()
-                end = time()
-
-                min_value: float = float('inf')
-                current_depth = 1
-                while end - start < Board.MAX_TIME and current_depth <= Board.MAX_DEPTH:
-                    (curr_letter, curr_index), value = self.alpha_beta_min_search(
-                        current_depth
-                    )
-                    if value < min_value:
-                        letter, index = curr_letter, curr_index
-
-                    current_depth += 1
-
-                    end = time()
-
-                assert letter is not None and index is not None
+            self.make_move(self.computer_move())
 
-                print(letter, index+1, sep="")
-                # print(f"Reached Depth {current_depth - 1} in {(time() - start):4f}s")
+        record_game(self, Board.RECORD_PATH)
+        print(self)
+        print("Winner:", winner)
 
-            else:
-                print(f"{self.turn}'s turn... ")
+    def computer_move(self) -> int:
+        """Searches for and prints the best move for the player to move"""
+        print(f"{self.turn}'s turn... ")
 
-                start = time()
-                end = time()
+        position = self.choose_move()
 
-                max_value = float('-inf')
-                current_depth = 1
-                while end - start < Board.MAX_TIME and current_depth <= Board.MAX_DEPTH:
-                    (curr_letter, curr_index), value = self.alpha_beta_max_search(
-                        current_depth
-                    )
+        print(Board.identifier_of(position))
+        if self.last_stats is not None:
+            print(self.last_stats.to_json())
 
-                    if value > max_value:
-                        letter, index = curr_letter, curr_index
+        return position
 
-                    current_depth += 1
+    def choose_move(self, limits: SearchLimits | None = None) -> int:
+        """
+        The position the computer plays for the player to move, from the
+        opening book or a search
 
-                    end = time()
+        The search runs for Board.MAX_TIME unless limits are passed, which
+        also lets another thread stop it to get the best move found so far
+        """
+        self.last_stats = None
+        if (position:=self._book_move()) is None:
+            self.last_stats = SearchStats() if Board.COLLECT_STATS else None
+            best_move = iterative_deepening(
+                self, Board.MAX_TIME, Board.MAX_DEPTH, Board.NODE_BUDGET,
+                get_searcher(Board.WORKERS).search, limits, self.last_stats
+            )
+            position = best_move.position
+        assert position is not None
 
-                assert letter is not None and index is not None
+        return position
 
-                print(letter, index+1, sep="")
-                # print(f"Reached Depth {current_depth - 1} in {(time() - start):4f}s")
+    def _book_move(self) -> int | None:
+        """The opening book's move for this position, if it has one"""
+        if Board.OPENING_BOOK is None:
+            return None
 
+        # The book holds one orientation of each position and its move
+        key, symmetry = self.canonical()
+        entry = Board.OPENING_BOOK.lookup(key)
+        if entry is None:
+            return None
 
-            self.place_piece(letter, index)
+        position = Board.from_canonical(entry.move, symmetry)
+        if (self.occupied >> position) & 1:
+            return None
 
-        print(self)
-        print("Winner:", winner)
+        return position
 
     def play_moves(
                 self,
@@ -245,123 +453,34 @@ class Board:
             print("Winner:", self.check_winners())
 
     def check_winners(self) -> Piece:
-        for row_ind, row in enumerate(self.board):
-            # Check for winners in each row
-            if (piece:=self._check_row_winners(row_ind)) != Piece.EMPTY:
-                return piece
-
-            for col_ind in range(len(row)):
-                # Check for winners in each column
-                if (piece:=self._check_col_winners(col_ind)) != Piece.EMPTY:
-                    return piece
-
-        return Piece.EMPTY
-
-    def _check_row_winners(self, row_ind: int) -> Piece:
-        return self._check_vector_winners(self.board[row_ind])
-
-    def _check_col_winners(self, col_ind: int) -> Piece:
-        return self._check_vector_winners([row[col_ind] for row in self.board])
-
-    def _check_vector_winners(self, vector: list[Piece]) -> Piece:
-        x_count = 0
-        o_count = 0
-        for piece in vector:
-            # Must be consecutive
-            if piece == Piece.X:
-                x_count += 1
-                o_count = 0
-            elif piece == Piece.O:
-                o_count += 1
-                x_count = 0
-            else:
-                x_count = 0
-                o_count = 0
-
-            # Find WIN consecutive elements
-            if x_count >= Board.WIN:
-                return Piece.X
-            if o_count >= Board.WIN:
-                return Piece.O
+        if has_line(self.x_bits, Board.WIN, Board.LINE_DIRECTIONS):
+            return Piece.X
+        if has_line(self.o_bits, Board.WIN, Board.LINE_DIRECTIONS):
+            return Piece.O
 
-        # No winner yet
         return Piece.EMPTY
 
     def count_empty(self) -> int:
-        return len([i for i in self.board for j in i if j == Piece.EMPTY])
-
-    def count_max(self) -> tuple[int, int]:
-
-        max_x = 0
-        max_o = 0
-        for row_ind, row in enumerate(self.board):
-            curr_x, curr_o = self._count_row_max(row_ind)
-            max_x = max(max_x, curr_x)
-            max_o = max(max_o, curr_o)
-
-            for col_ind in range(len(row)):
-                curr_x, curr_o = self._count_col_max(col_ind)
-                max_x = max(max_x, curr_x)
-                max_o = max(max_o, curr_o)
-
-        return max_x, max_o
-
-    def _count_row_max(self, row_ind: int) -> tuple[int, int]:
-        return self._count_vector_max(self.board[row_ind])
-
-    def _count_col_max(self, col_ind: int) -> tuple[int, int]:
-        return self._count_vector_max([row[col_ind] for row in self.board])
-
-    def _count_vector_max(self, vector: list[Piece]) -> tuple[int, int]:
-        max_x = 0
-        max_o = 0
-
-        x_count = 0
-        o_count = 0
-        for piece in vector:
-            # Must be consecutive
-            if piece == Piece.X:
-                x_count += 1
-
-                if o_count > max_o:
-                    max_o = o_count
-                o_count = 0
-
-            elif piece == piece.O:
-                o_count += 1
-                if x_count > max_x:
-                    max_x = x_count
-                x_count = 0
-
-            else:
-                if x_count > max_x:
-                    max_x = x_count
-                x_count = 0
-
-                if o_count > max_o:
-                    max_o = o_count
-                o_count = 0
-
-        # No winner yet
-        return max_x, max_o
+        return Board.DIMENSIONS * Board.DIMENSIONS - count_bits(self.occupied)
 
     # TRANSLATION AND PARSING
     def _get_user_input(self) -> tuple[int, int]:
-        chosen = input(f"{self.turn}'s turn: ")
+        while True:
+            chosen = input(f"{self.turn}'s turn: ")
 
-        try:
-            letter, index = Board._parse_identifier(chosen)
-            letter_index = Board._translate_to_index(letter)
+            try:
+                letter, index = Board._parse_identifier(chosen)
+                letter_index = Board._translate_to_index(letter)
 
-            # Ensure the spot is available
-            if self.board[letter_index][index] != Piece.EMPTY:
-                raise ValueError("That spot is already filled.")
+                # Ensure the spot is available
+                if self.piece_at(letter_index, index) != Piece.EMPTY:
+                    raise ValueError("That spot is already filled.")
 
-        except Exception as e:
-            print(e, "Try Again")
-            return self._get_user_input()
+            except Exception as e:
+                print(e, "Try Again")
+                continue
 
-        return letter_index, index
+            return letter_index, index
 
     @staticmethod
     def _translate_to_letter(index: int) -> str:
@@ -393,6 +512,13 @@ class Board:
 
         return letter.upper() + str(index + 1)
 
+    @staticmethod
+    def identifier_of(position: int) -> str:
+        """The identifier of a bit position, such as 'D4'"""
+        return Board._translate_to_identifier(
+            *coordinates_of(position, Board.DIMENSIONS)
+        )
+
     @staticmethod
     def _parse_identifier(identifier: str) -> tuple[str, int]:
         possible = ["A", "B", "C", "D", "E", "F", "G", "H"][:Board.DIMENSIONS]
@@ -428,95 +554,67 @@ class Board:
         return o.rstrip()
 
     def __repr__(self) -> str:
-        return self.moves_identifier.strip()
+        return self.moves_identifier
 
     def __hash__(self) -> int:
-        return hash(repr(self))
+        return self.key
 
     def __eq__(self, o: object) -> bool:
+        # Positions are equal no matter the order their moves were played in
         return (
             isinstance(o, Board) and
-            repr(self) ==
-            repr(o)
+            self.x_bits == o.x_bits and
+            self.o_bits == o.o_bits and
+            self.turn == o.turn
         )
 
     def alpha_beta_max_search(self, depth: int) -> tuple[tuple[str, int], float]:
-        best_move = max_value(
-            self,
-            float('-inf'),
-            float('inf'),
-            depth,
-        )
-
-        # print(f"Input Move was {repr(self)}")
-        # print(f"Best Move for depth {depth} was {repr(best_move.board)} with {best_move.value}.")
-
-        assert best_move.board
-        difference = self.difference(best_move.board)
-
-        if not difference:
-            identifier = ("Z", -1)
-        else:
-            identifier = Board._parse_identifier(difference.pop(0))
-
-        return identifier, best_move.value
+        """
+        Searches to depth for the player to move, which is X for the
+        maximizing search, valuing the result from X's point of view
+        """
+        return self._search_identifier(depth)
 
     def alpha_beta_min_search(self, depth: int) -> tuple[tuple[str, int], float]:
-        best_move = min_value(
-            self,
-            float('-inf'),
-            float('inf'),
-            depth
-        )
-
-        # print(f"Input Move was {repr(self)}")
-        # print(f"Best Move for depth {depth} was {repr(best_move.board)} with {best_move.value}.")
+        """
+        Searches to depth for the player to move, which is O for the
+        minimizing search, valuing the result from X's point of view
+        """
+        return self._search_identifier(depth)
 
-        assert best_move.board
-        difference = self.difference(best_move.board)
+    def _search_identifier(self, depth: int) -> tuple[tuple[str, int], float]:
+        best_move = search(self, depth)
+        value = best_move.value if self.turn == Piece.X else -best_move.value
 
-        if not difference:
-            identifier = ("Z", -1)
-        else:
-            identifier = Board._parse_identifier(difference.pop(0))
+        if best_move.position is None:
+            return ("Z", -1), value
 
-        return identifier, best_move.value
+        letter, index = coordinates_of(best_move.position, Board.DIMENSIONS)
+        return (Board._translate_to_letter(letter), index), value
 
     def value_of(self, winner: Piece = Piece.EMPTY) -> int:
 
-        WIN_VALUE = 100_000
-        LOSE_VALUE = -100_00
-        TIE_VALUE = 0
-
         if winner == Piece.O:
-            return LOSE_VALUE
+            return Board.LOSE_VALUE
 
         if winner == Piece.X:
-            return WIN_VALUE
+            return Board.WIN_VALUE
 
         if self.count_empty() == 0:
-            return TIE_VALUE
-
-        max_x, max_o = self.count_max()
-
-        if max_o >= Board.WIN:
-            return LOSE_VALUE
-
-        if max_x >= Board.WIN:
-            return WIN_VALUE
+            return Board.TIE_VALUE
 
-        return max_x - max_o
+        return self.evaluator.value(self.turn, self.occupied)
 
 def get_starter() -> Piece:
-    starter = input("Would you like to start? (y/n): ")
-    match(starter):
-        case 'y':
-            return Piece.O
-        case 'n':
-            return Piece.X
-        case _:
-            print("You must enter 'y' or 'n'. Try Again.")
-            return get_starter()
+    while True:
+        starter = input("Would you like to start? (y/n): ")
+        match(starter):
+            case 'y':
+                return Piece.O
+            case 'n':
+                return Piece.X
+            case _:
+                print("You must enter 'y' or 'n'. Try Again.")
 
 if __name__ == "__main__":
 
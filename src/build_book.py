@@ -0,0 +1,65 @@
+from __future__ import annotations
+from argparse import ArgumentParser
+from piece import Piece
+from board import Board
+import ab_prune_utils
+from ab_prune_utils import MOVE_ORDERER, iterative_deepening
+from opening_book import DEFAULT_BOOK_PATH, BookEntry, OpeningBook
+
+def build_book(plies: int, depth: int, width: int) -> dict[int, BookEntry]:
+    """
+    Searches every position reachable in plies moves when both players
+    pick one of the width best moves, for either player starting
+
+    Each position is searched to depth and its best move is recorded under
+    its canonical key, so rotations and reflections are only searched once
+    """
+    entries: dict[int, BookEntry] = {}
+
+    def expand(board: Board, plies_left: int) -> None:
+        key, symmetry = board.canonical()
+        if (
+            plies_left <= 0 or
+            key in entries or
+            board.check_winners() != Piece.EMPTY
+        ):
+            return
+
+        best_move = iterative_deepening(board, float('inf'), depth)
+        assert best_move.position is not None
+        entries[key] = BookEntry(
+            Board.to_canonical(best_move.position, symmetry), depth,
+            int(best_move.value)
+        )
+
+        candidates = [best_move.position] + [
+            position for position in MOVE_ORDERER.order(board)
+            if position != best_move.position
+        ]
+        for position in candidates[:width]:
+            board.make_move(position)
+            expand(board, plies_left - 1)
+            board.undo_move()
+
+    for starter in (Piece.X, Piece.O):
+        ab_prune_utils.TRANSPOSITION_TABLE.clear()
+        MOVE_ORDERER.clear()
+        expand(Board(starter), plies)
+
+    return entries
+
+def main(argv: list[str] | None = None) -> None:
+    parser = ArgumentParser(description="Builds an opening book by deep search.")
+    parser.add_argument("--plies", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--width", type=int, default=3)
+    parser.add_argument("--output", default=str(DEFAULT_BOOK_PATH))
+    args = parser.parse_args(argv)
+
+    entries = build_book(args.plies, args.depth, args.width)
+    OpeningBook.write(args.output, entries)
+
+    print(f"Wrote {len(entries)} positions to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+from enum import Enum
+from time import time
+from typing import TYPE_CHECKING, Any
+from piece import Piece
+from bitboard import iterate_bits, line_cells
+from transposition import Bound
+
+if TYPE_CHECKING:
+    from board import Board
+    from ab_prune_utils import SearchLimits
+
+class Outcome(Enum):
+    """The result of a position with perfect play, for the player to move"""
+
+    WIN = 1
+    DRAW = 0
+    LOSS = -1
+
+class EndgameResult:
+    """The outcome of a solved position, the plies until it and the move to play"""
+
+    __slots__ = ("outcome", "distance", "move", "value", "nodes", "elapsed")
+
+    def __init__(
+                self,
+                outcome: Outcome,
+                distance: int,
+                move: int | None,
+                value: int,
+                nodes: int,
+                elapsed: float
+            ) -> None:
+        self.outcome = outcome
+        # Plies until the game is won or lost, or until the board is full
+        self.distance = distance
+        self.move = move
+        # From the point of view of the player to move, see EndgameSolver
+        self.value = value
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "outcome": self.outcome.name.lower(),
+            "distance": self.distance,
+            "nodes": self.nodes,
+            "elapsed": self.elapsed,
+        }
+
+class EndgameSolver:
+    """
+    Solves positions with few empty cells exactly, searching every move to
+    the end of the game
+
+    A win is valued WIN_VALUE less the plies until the line is made, so the
+    solver plays the quickest win and the slowest loss, and a draw is 0.
+    Values don't depend on a depth, so the table of results is kept between
+    solves and the moves after a solved position are mostly answered from
+    it.
+    """
+
+    WIN_VALUE = 100_000
+    # Positions kept between solves before starting over
+    MAX_ENTRIES = 1 << 20
+
+    def __init__(self) -> None:
+        # Keyed by Zobrist key, the value, its bound and the best move
+        self.table: dict[int, tuple[int, Bound, int | None]] = {}
+
+        self.nodes = 0
+        self.solved = 0
+
+    def new_search(self) -> None:
+        if len(self.table) > EndgameSolver.MAX_ENTRIES:
+            self.table.clear()
+        self.nodes = 0
+
+    def clear(self) -> None:
+        self.table.clear()
+        self.nodes = 0
+        self.solved = 0
+
+    def solve(
+                self,
+                board: Board,
+                limits: SearchLimits | None = None
+            ) -> EndgameResult | None:
+        """
+        The exact result of the board for the player to move, or None if
+        the game is over or the limits ran out first, leaving the board as
+        it was
+        """
+        from ab_prune_utils import SearchTimeout
+
+        self.new_search()
+        start = time()
+        moves_played = len(board.history)
+
+        if board.check_winners() != Piece.EMPTY:
+            return None
+
+        try:
+            # Draws, the usual result, are proven with the narrowest window,
+            # then a win or loss is searched again for its distance
+            value = self._negamax(board, -1, 1, limits)
+            if value > 0:
+                value = self._negamax(board, 0, EndgameSolver.WIN_VALUE, limits)
+            elif value < 0:
+                value = self._negamax(board, -EndgameSolver.WIN_VALUE, 0, limits)
+        except SearchTimeout:
+            while len(board.history) > moves_played:
+                board.undo_move()
+            return None
+
+        self.solved += 1
+        if value > 0:
+            outcome, distance = Outcome.WIN, EndgameSolver.WIN_VALUE - value
+        elif value < 0:
+            outcome, distance = Outcome.LOSS, EndgameSolver.WIN_VALUE + value
+        else:
+            outcome, distance = Outcome.DRAW, board.count_empty()
+
+        # Positions decided without a search, such as dead draws, have no
+        # move stored and any empty cell will do
+        move = self.table[board.key][2] if board.key in self.table else None
+        if move is None and board.count_empty():
+            move = next(iterate_bits(board.FULL_MASK & ~board.occupied))
+
+        return EndgameResult(
+            outcome, distance, move, value, self.nodes, time() - start
+        )
+
+    @staticmethod
+    def _parent_value(value: int) -> int:
+        """A child's value for the player who moved to it, one ply further away"""
+        if value > 0:
+            return 1 - value
+        if value < 0:
+            return -1 - value
+        return 0
+
+    def _negamax(
+                self,
+                board: Board,
+                alpha: int,
+                beta: int,
+                limits: SearchLimits | None
+            ) -> int:
+        self.nodes += 1
+        if limits is not None:
+            limits.visit()
+
+        # No move searched makes a line, a win on the spot is taken instead
+        if board.count_empty() == 0:
+            return 0
+
+        turn = board.turn
+        evaluator = board.evaluator
+        occupied = board.occupied
+
+        if wins:=evaluator.threat_cells(turn, occupied):
+            self.table[board.key] = (
+                EndgameSolver.WIN_VALUE - 1, Bound.EXACT, next(iterate_bits(wins))
+            )
+            return EndgameSolver.WIN_VALUE - 1
+
+        # Cells of lines a player could still make with every empty cell
+        live = line_cells(
+            board.FULL_MASK & ~board.o_bits, board.WIN, board.LINE_DIRECTIONS
+        ) | line_cells(
+            board.FULL_MASK & ~board.x_bits, board.WIN, board.LINE_DIRECTIONS
+        )
+        # Nobody can make a line anymore, the board fills up
+        if not live:
+            return 0
+
+        entry = self.table.get(board.key)
+        tt_move = None
+        if entry is not None:
+            value, bound, tt_move = entry
+            if (
+                bound == Bound.EXACT or
+                (bound == Bound.LOWER and value >= beta) or
+                (bound == Bound.UPPER and value <= alpha)
+            ):
+                return value
+
+        blocks = evaluator.threat_cells(Piece.other(turn), occupied)
+        if blocks:
+            # A line of the opponent must be blocked, with two the game is
+            # lost whichever is blocked
+            moves = [next(iterate_bits(blocks))]
+        else:
+            # Moves that make a threat first, they force a reply. A piece
+            # on a cell outside every live line changes nothing but the
+            # turn, so one such cell stands for all of them.
+            threats = evaluator.threat_moves(turn, occupied)
+            moves = list(iterate_bits(threats)) + list(
+                iterate_bits(live & ~occupied & ~threats)
+            )
+            if dead:=board.FULL_MASK & ~occupied & ~live:
+                moves.append(next(iterate_bits(dead)))
+        if tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        alpha_original = alpha
+        best_value, best_position = -EndgameSolver.WIN_VALUE - 1, None
+        for position in moves:
+            board.make_move(position)
+            # Values one ply further away shift by one, so the child's window
+            # is widened to keep its bounds exact about this window
+            value = EndgameSolver._parent_value(
+                self._negamax(board, -beta - 1, -alpha + 1, limits)
+            )
+            board.undo_move()
+
+            if value > best_value:
+                best_value, best_position = value, position
+            alpha = max(alpha, best_value)
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_original:
+            bound = Bound.UPPER
+        elif best_value >= beta:
+            bound = Bound.LOWER
+        else:
+            bound = Bound.EXACT
+        self.table[board.key] = (best_value, bound, best_position)
+
+        return best_value
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "nodes": self.nodes,
+            "solved": self.solved,
+            "positions": len(self.table),
+        }
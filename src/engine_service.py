@@ -0,0 +1,440 @@
+from __future__ import annotations
+import asyncio
+import os
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import Array
+from queue import Empty, SimpleQueue
+from threading import Lock
+from time import time
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+from piece import Piece
+from board import Board
+from ab_prune_utils import SearchLimits, iterative_deepening
+
+# One stop flag per search slot of the service, set by _init_worker
+_STOP_FLAGS: Any = None
+
+def _init_worker(stop_flags: Any) -> None:
+    global _STOP_FLAGS
+    _STOP_FLAGS = stop_flags
+
+class _SlotLimits(SearchLimits):
+    """Limits of a search in a worker, stopped through its slot's shared flag"""
+
+    def __init__(self, slot: int, deadline: float | None) -> None:
+        self.slot = slot
+        super().__init__(deadline)
+
+    @property
+    def stopped(self) -> bool:
+        return bool(_STOP_FLAGS[self.slot])
+
+    @stopped.setter
+    def stopped(self, value: bool) -> None:
+        # Only the service clears the flag, when it hands out the slot, so
+        # a stop sent while the search waited for the worker isn't lost
+        if value:
+            _STOP_FLAGS[self.slot] = True
+
+def _replay(starter: Piece, history: list[int]) -> Board:
+    board = Board(starter)
+    for position in history:
+        board.make_move(position)
+    return board
+
+def _search(starter: Piece, history: list[int], slot: int, deadline: float) -> int:
+    return _replay(starter, history).choose_move(_SlotLimits(slot, deadline))
+
+def _ponder(starter: Piece, history: list[int], slot: int) -> None:
+    limits = _SlotLimits(slot, None)
+    if limits.stopped:
+        return
+    iterative_deepening(
+        _replay(starter, history), float('inf'), Board.MAX_DEPTH,
+        limits=limits, threat_plies=0
+    )
+
+class EngineService:
+    """
+    Plays many games at once for asyncio clients without blocking the event
+    loop
+
+    Searches run on worker processes, each with its own board and
+    transposition table, and every game is kept on one worker so its
+    searches reuse that table. Up to workers games search at once, the
+    searches of games sharing a worker wait for each other, and the clock
+    of a move starts when it is requested, not when a worker is free. While
+    an opponent thinks, the game's worker ponders the position the opponent
+    faces to fill its table, until another search needs the worker.
+    """
+
+    # Searches and ponders that can be running or waiting at once
+    SEARCH_SLOTS = 256
+
+    def __init__(
+                self,
+                ponder: bool = True,
+                move_time: float = Board.MAX_TIME,
+                workers: int | None = None
+            ) -> None:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("There must be at least one worker.")
+
+        self.ponder = ponder
+        self.move_time = move_time
+
+        self.games: dict[str, Board] = {}
+        # The slot and future of the search running in each game
+        self.searches: dict[str, tuple[int, Future]] = {}
+
+        self._stop_flags = Array('b', EngineService.SEARCH_SLOTS, lock=False)
+        self._free_slots: SimpleQueue[int] = SimpleQueue()
+        for slot in range(EngineService.SEARCH_SLOTS):
+            self._free_slots.put(slot)
+
+        # Pools of a single process, so each game's searches find its table
+        self._workers = [
+            ProcessPoolExecutor(1, initializer=_init_worker, initargs=(self._stop_flags,))
+            for _ in range(workers)
+        ]
+        self._worker_of: dict[str, int] = {}
+        # The slot and future of the ponder started in each game
+        self._ponders: dict[str, tuple[int, Future]] = {}
+        # Slots are freed from the executors' threads, see _stop_slot
+        self._lock = Lock()
+
+    def start_game(
+                self,
+                starter: Piece = Piece.X,
+                moves: str = "",
+                game_id: str | None = None
+            ) -> str:
+        """Starts a game from the space separated moves and returns its id"""
+        if game_id is None:
+            game_id = uuid4().hex[:8]
+        if game_id in self.games:
+            raise ValueError(f"There is already a game {game_id}.")
+
+        board = Board(starter)
+        board.play_moves(moves)
+        self.games[game_id] = board
+
+        # The worker with the fewest games
+        loads = [0] * len(self._workers)
+        for worker in self._worker_of.values():
+            loads[worker] += 1
+        self._worker_of[game_id] = loads.index(min(loads))
+
+        return game_id
+
+    def end_game(self, game_id: str) -> None:
+        self.stop(game_id)
+        if (ponder:=self._ponders.pop(self._check_game(game_id), None)) is not None:
+            self._stop_slot(*ponder)
+        del self.games[game_id]
+        del self._worker_of[game_id]
+
+    def submit_move(self, game_id: str, move: str) -> str:
+        """Plays the opponent's move, such as 'D4', and returns the state"""
+        board = self.games[self._check_game(game_id)]
+        if game_id in self.searches:
+            raise ValueError("The engine is moving in that game.")
+        self._check_playing(board)
+
+        board.place_piece(*Board._parse_identifier(move))
+
+        # The pondered position is decided, free the worker for real searches
+        self._stop_pondering(self._worker_of[game_id])
+        return self.state(game_id)
+
+    async def request_move(self, game_id: str, move_time: float | None = None) -> str:
+        """
+        Searches for the engine's move for up to move_time seconds from the
+        call, plays it and returns it, such as 'D4'
+
+        stop ends the search early with the best move found so far, while
+        cancelling the call stops the search without playing anything
+        """
+        board = self.games[self._check_game(game_id)]
+        if game_id in self.searches:
+            raise ValueError("The engine is already moving in that game.")
+        self._check_playing(board)
+
+        deadline = time() + (self.move_time if move_time is None else move_time)
+        worker = self._worker_of[game_id]
+        self._stop_pondering(worker)
+
+        slot, future = self._submit(
+            worker, _search, board.order[0], board.history.copy(), deadline
+        )
+        self.searches[game_id] = (slot, future)
+        try:
+            position = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self._stop_slot(slot, future)
+            raise
+        finally:
+            del self.searches[game_id]
+
+        if game_id not in self.games:
+            raise ValueError(f"Game {game_id} ended during the search.")
+        board.make_move(position)
+
+        if self.ponder and self.state(game_id) == "playing":
+            self._start_pondering(game_id, board)
+
+        return Board.identifier_of(position)
+
+    def stop(self, game_id: str) -> bool:
+        """Ends the game's search early, returning whether one was running"""
+        if (search:=self.searches.get(game_id)) is None:
+            return False
+        self._stop_slot(*search)
+        return True
+
+    def state(self, game_id: str) -> str:
+        """'playing', 'draw', or the winning piece"""
+        board = self.games[self._check_game(game_id)]
+        if (winner:=board.check_winners()) != Piece.EMPTY:
+            return str(winner)
+        if board.count_empty() == 0:
+            return "draw"
+        return "playing"
+
+    def close(self) -> None:
+        for slot in range(EngineService.SEARCH_SLOTS):
+            self._stop_flags[slot] = True
+        for executor in self._workers:
+            executor.shutdown(cancel_futures=True)
+
+    def _check_game(self, game_id: str) -> str:
+        if game_id not in self.games:
+            raise ValueError(f"There is no game {game_id}.")
+        return game_id
+
+    @staticmethod
+    def _check_playing(board: Board) -> None:
+        if board.check_winners() != Piece.EMPTY or board.count_empty() == 0:
+            raise ValueError("That game is over.")
+
+    def _submit(
+                self,
+                worker: int,
+                function: Callable[..., Any],
+                starter: Piece,
+                history: list[int],
+                *args: Any
+            ) -> tuple[int, Future]:
+        """
+        Runs function on the worker with a free slot, which is only freed
+        once the function returns, so a search that was stopped but is
+        still running can't be started again by a search reusing its slot
+        """
+        try:
+            slot = self._free_slots.get_nowait()
+        except Empty:
+            raise ValueError("Too many searches at once.") from None
+        self._stop_flags[slot] = False
+
+        future = self._workers[worker].submit(function, starter, history, slot, *args)
+        future.add_done_callback(lambda _: self._free_slot(slot))
+        return slot, future
+
+    def _free_slot(self, slot: int) -> None:
+        with self._lock:
+            self._free_slots.put(slot)
+
+    def _stop_slot(self, slot: int, future: Future) -> None:
+        """
+        Stops the function running in slot, unless it is done. A slot is
+        only freed after its future is done, so it isn't yet in use by
+        another search.
+        """
+        with self._lock:
+            if not future.done():
+                self._stop_flags[slot] = True
+
+    def _start_pondering(self, game_id: str, board: Board) -> None:
+        try:
+            self._ponders[game_id] = self._submit(
+                self._worker_of[game_id], _ponder, board.order[0], board.history.copy()
+            )
+        except ValueError:
+            # Every slot is taken, searching matters more than pondering
+            pass
+
+    def _stop_pondering(self, worker: int) -> None:
+        """Stops every ponder on the worker"""
+        for game_id in [
+            game_id for game_id in self._ponders
+            if self._worker_of[game_id] == worker
+        ]:
+            self._stop_slot(*self._ponders.pop(game_id))
+
+# Commands of the line protocol and their arguments
+USAGE = {
+    "new": "new [X|O] [MOVES...]",
+    "move": "move GAME CELL",
+    "go": "go GAME [SECONDS]",
+    "stop": "stop GAME",
+    "show": "show GAME",
+    "end": "end GAME",
+    "quit": "quit",
+}
+
+async def serve_lines(
+            service: EngineService,
+            read_line: Callable[[], Awaitable[str]],
+            write_line: Callable[[str], None]
+        ) -> None:
+    """
+    Answers the commands of one client until it quits or its input ends,
+    one command per line:
+
+        new [X|O] [MOVES...]    ok GAME STATE
+        move GAME CELL          ok GAME STATE
+        go GAME [SECONDS]       bestmove GAME CELL STATE
+        stop GAME               ok GAME
+        show GAME               ok GAME STATE MOVES...
+        end GAME                ok GAME
+
+    go is answered when its search ends, and other commands can be sent in
+    the meantime. STATE is 'playing', 'draw' or the winner, failures are
+    answered with 'error MESSAGE'.
+    """
+    searches: set[asyncio.Task[None]] = set()
+
+    while line:=await read_line():
+        if not (words:=line.split()):
+            continue
+        command, arguments = words[0].lower(), words[1:]
+
+        if command == "quit":
+            break
+
+        if command == "go":
+            task = asyncio.create_task(_go(service, arguments, write_line))
+            searches.add(task)
+            task.add_done_callback(searches.discard)
+            continue
+
+        try:
+            write_line(_answer(service, command, arguments))
+        except ValueError as e:
+            write_line(f"error {e}")
+
+    for task in searches:
+        task.cancel()
+
+def _answer(service: EngineService, command: str, arguments: list[str]) -> str:
+    if command not in USAGE:
+        raise ValueError(f"Unknown command {command}.")
+
+    if command == "new":
+        starter = Piece.X
+        if arguments and arguments[0].upper() in ("X", "O"):
+            starter = Piece[arguments.pop(0).upper()]
+        game_id = service.start_game(starter, " ".join(arguments))
+        return f"ok {game_id} {service.state(game_id)}"
+
+    if not arguments:
+        raise ValueError(f"Usage: {USAGE[command]}")
+    game_id = arguments[0]
+
+    match(command):
+        case "move":
+            if len(arguments) != 2:
+                raise ValueError(f"Usage: {USAGE[command]}")
+            return f"ok {game_id} {service.submit_move(game_id, arguments[1])}"
+        case "stop":
+            service.stop(game_id)
+        case "show":
+            state = service.state(game_id)
+            return f"ok {game_id} {state} {service.games[game_id]!r}".rstrip()
+        case "end":
+            service.end_game(game_id)
+
+    return f"ok {game_id}"
+
+async def _go(
+            service: EngineService,
+            arguments: list[str],
+            write_line: Callable[[str], None]
+        ) -> None:
+    try:
+        if not 1 <= len(arguments) <= 2:
+            raise ValueError(f"Usage: {USAGE['go']}")
+        game_id = arguments[0]
+        move_time = float(arguments[1]) if len(arguments) == 2 else None
+
+        move = await service.request_move(game_id, move_time)
+        write_line(f"bestmove {game_id} {move} {service.state(game_id)}")
+    except ValueError as e:
+        write_line(f"error {e}")
+
+async def serve_stdio(service: EngineService) -> None:
+    loop = asyncio.get_running_loop()
+
+    async def read_line() -> str:
+        return await loop.run_in_executor(None, sys.stdin.readline)
+
+    await serve_lines(service, read_line, lambda line: print(line, flush=True))
+
+async def serve_tcp(service: EngineService, host: str, port: int) -> None:
+    async def handle(
+                reader: asyncio.StreamReader,
+                writer: asyncio.StreamWriter
+            ) -> None:
+        async def read_line() -> str:
+            return (await reader.readline()).decode()
+
+        try:
+            await serve_lines(
+                service, read_line,
+                lambda line: writer.write((line + "\n").encode())
+            )
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+def main(argv: list[str] | None = None) -> None:
+    parser = ArgumentParser(
+        description="Serves games over a line protocol on stdio or a local socket."
+    )
+    parser.add_argument(
+        "--port", type=int, default=None,
+        help="Listen on this TCP port instead of stdio"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--time", type=float, default=Board.MAX_TIME)
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Processes to search on, games beyond it share them. All CPUs by default."
+    )
+    parser.add_argument(
+        "--no-ponder", action="store_true",
+        help="Don't search while waiting for the opponent"
+    )
+    args = parser.parse_args(argv)
+
+    service = EngineService(not args.no_ponder, args.time, args.workers)
+    try:
+        if args.port is None:
+            asyncio.run(serve_stdio(service))
+        else:
+            asyncio.run(serve_tcp(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+from __future__ import annotations
+from functools import lru_cache
+from piece import Piece
+from bitboard import position_of
+
+@lru_cache
+def line_windows(dimensions: int, win: int) -> tuple[tuple[int, ...], ...]:
+    """The cell positions of every segment of win cells in a row or column"""
+    windows: list[tuple[int, ...]] = []
+    for line in range(dimensions):
+        for start in range(dimensions - win + 1):
+            windows.append(tuple(
+                position_of(line, start + step, dimensions)
+                for step in range(win)
+            ))
+            windows.append(tuple(
+                position_of(start + step, line, dimensions)
+                for step in range(win)
+            ))
+
+    return tuple(windows)
+
+@lru_cache
+def window_masks(dimensions: int, win: int) -> tuple[int, ...]:
+    """A bitboard mask of the cells of each window of line_windows"""
+    return tuple(
+        sum(1 << position for position in window)
+        for window in line_windows(dimensions, win)
+    )
+
+@lru_cache
+def cell_windows(dimensions: int, win: int) -> tuple[tuple[int, ...], ...]:
+    """The indices in line_windows of the windows each cell is in"""
+    windows: list[list[int]] = [[] for _ in range(dimensions * dimensions)]
+    for window_ind, window in enumerate(line_windows(dimensions, win)):
+        for position in window:
+            windows[position].append(window_ind)
+
+    return tuple(tuple(cell) for cell in windows)
+
+@lru_cache
+def window_scores(win: int) -> tuple[tuple[int, ...], ...]:
+    """
+    The value of a window from X's point of view, indexed by its X count
+    then its O count
+
+    A window holding both pieces can never be completed so it is worth
+    nothing, otherwise every extra piece is worth ten times more
+    """
+    scores: list[tuple[int, ...]] = []
+    for x_count in range(win + 1):
+        row: list[int] = []
+        for o_count in range(win + 1):
+            if x_count and o_count:
+                row.append(0)
+            elif x_count:
+                row.append(10 ** (x_count - 1))
+            elif o_count:
+                row.append(-(10 ** (o_count - 1)))
+            else:
+                row.append(0)
+        scores.append(tuple(row))
+
+    return tuple(scores)
+
+class ThreatEvaluator:
+    """
+    Keeps the number of X and O pieces in every window of WIN cells up to
+    date as pieces are placed and removed
+
+    The sum of the window scores and the windows one piece away from
+    completion (threats) are updated incrementally, so evaluating a position
+    costs the same no matter how full the board is
+    """
+
+    # Worth less than an actual win or loss, more than any window sum
+    FORCED_WIN_VALUE = 5_000
+
+    __slots__ = (
+        "win", "windows", "scores", "window_masks", "cell_windows",
+        "x_counts", "o_counts", "score", "x_threats", "o_threats",
+    )
+
+    def __init__(self, dimensions: int, win: int) -> None:
+        self.win = win
+        # Shared by every evaluator of the same board size
+        self.windows = line_windows(dimensions, win)
+        self.scores = window_scores(win)
+        self.window_masks = window_masks(dimensions, win)
+        self.cell_windows = cell_windows(dimensions, win)
+
+        self.x_counts = [0] * len(self.windows)
+        self.o_counts = [0] * len(self.windows)
+        self.score = 0
+
+        self.x_threats: set[int] = set()
+        self.o_threats: set[int] = set()
+
+    def copy(self) -> ThreatEvaluator:
+        evaluator = ThreatEvaluator.__new__(ThreatEvaluator)
+        evaluator.win = self.win
+        evaluator.windows = self.windows
+        evaluator.scores = self.scores
+        evaluator.window_masks = self.window_masks
+        evaluator.cell_windows = self.cell_windows
+
+        evaluator.x_counts = self.x_counts.copy()
+        evaluator.o_counts = self.o_counts.copy()
+        evaluator.score = self.score
+        evaluator.x_threats = self.x_threats.copy()
+        evaluator.o_threats = self.o_threats.copy()
+
+        return evaluator
+
+    def place(self, position: int, piece: Piece) -> None:
+        self._update(position, piece, 1)
+
+    def remove(self, position: int, piece: Piece) -> None:
+        self._update(position, piece, -1)
+
+    def _update(self, position: int, piece: Piece, change: int) -> None:
+        x_counts, o_counts, scores = self.x_counts, self.o_counts, self.scores
+        threat = self.win - 1
+
+        for window_ind in self.cell_windows[position]:
+            x_count = x_counts[window_ind]
+            o_count = o_counts[window_ind]
+            self.score -= scores[x_count][o_count]
+
+            if piece == Piece.X:
+                x_count += change
+                x_counts[window_ind] = x_count
+            else:
+                o_count += change
+                o_counts[window_ind] = o_count
+            self.score += scores[x_count][o_count]
+
+            if x_count == threat and not o_count:
+                self.x_threats.add(window_ind)
+            else:
+                self.x_threats.discard(window_ind)
+
+            if o_count == threat and not x_count:
+                self.o_threats.add(window_ind)
+            else:
+                self.o_threats.discard(window_ind)
+
+    def threat_cells(self, piece: Piece, occupied: int) -> int:
+        """A mask of the empty cells that would complete a line for piece"""
+        cells = 0
+        for window_ind in (self.x_threats if piece == Piece.X else self.o_threats):
+            cells |= self.window_masks[window_ind]
+        return cells & ~occupied
+
+    def threat_moves(self, piece: Piece, occupied: int) -> int:
+        """A mask of the empty cells that would give piece a new threat"""
+        counts, other_counts = (
+            (self.x_counts, self.o_counts) if piece == Piece.X
+            else (self.o_counts, self.x_counts)
+        )
+        building = self.win - 2
+
+        cells = 0
+        for window_ind, count in enumerate(counts):
+            if count == building and not other_counts[window_ind]:
+                cells |= self.window_masks[window_ind]
+        return cells & ~occupied
+
+    def value(self, turn: Piece, occupied: int) -> int:
+        """
+        The value of a position without a winner from X's point of view
+
+        The player to move wins if they have a threat, and the other player
+        wins if they have two threats on different cells since only one can
+        be blocked
+        """
+        sign = 1 if turn == Piece.X else -1
+        movers, others = (
+            (self.x_threats, self.o_threats) if turn == Piece.X
+            else (self.o_threats, self.x_threats)
+        )
+
+        if movers:
+            return sign * ThreatEvaluator.FORCED_WIN_VALUE
+
+        if len(others) >= 2:
+            other_cells = self.threat_cells(Piece.other(turn), occupied)
+            if other_cells & (other_cells - 1):
+                return -sign * ThreatEvaluator.FORCED_WIN_VALUE
+
+        return self.score
@@ -0,0 +1,213 @@
+from __future__ import annotations
+import struct
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from time import time
+from typing import TYPE_CHECKING, Iterable, Iterator
+from piece import Piece
+
+if TYPE_CHECKING:
+    from board import Board
+
+DEFAULT_RECORD_PATH = Path(__file__).resolve().parent.parent / "output" / "games.rec"
+
+class GameRecord:
+    """The moves of one game, as positions, with who started and who won"""
+
+    __slots__ = ("starter", "moves", "winner", "played_at")
+
+    def __init__(
+                self,
+                starter: Piece,
+                moves: list[int],
+                winner: Piece = Piece.EMPTY,
+                played_at: int | None = None
+            ) -> None:
+        self.starter = starter
+        self.moves = moves
+        # EMPTY for a draw or a game that was not finished
+        self.winner = winner
+        # Unix time the game was recorded at
+        self.played_at = int(time()) if played_at is None else played_at
+
+    @classmethod
+    def from_board(cls, board: Board) -> GameRecord:
+        return cls(board.order[0], list(board.history), board.check_winners())
+
+    def replay(self) -> Board:
+        """A board with every move of the game played"""
+        from board import Board
+
+        board = Board(self.starter)
+        for position in self.moves:
+            board.make_move(position)
+        return board
+
+class GameArchive:
+    """
+    Games stored as fixed size records in a binary file, one per game
+
+    Each record holds the time the game was recorded, the starting player,
+    the winner, the number of moves and one byte per move, padded to one
+    byte per cell of the board. Games are only ever appended, so a game
+    loop can add its game when it ends, and readers stream the records in
+    chunks instead of loading the archive.
+    """
+
+    MAGIC = b"4GR1"
+    # Magic and dimensions of the board
+    HEADER = struct.Struct("<4sB")
+    # Records read at once when streaming
+    CHUNK_RECORDS = 4096
+
+    @staticmethod
+    def record_struct(dimensions: int) -> struct.Struct:
+        """Time, starter, winner, move count and moves padded to every cell"""
+        return struct.Struct(f"<IBBB{dimensions * dimensions}s")
+
+    @staticmethod
+    def append(
+                path: str | Path,
+                records: Iterable[GameRecord],
+                dimensions: int = 8
+            ) -> None:
+        """Appends the games to the archive at path, creating it if needed"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(path, "ab") as archive_file:
+            if archive_file.tell() == 0:
+                archive_file.write(GameArchive.HEADER.pack(GameArchive.MAGIC, dimensions))
+            elif GameArchive._read_dimensions(path) != dimensions:
+                raise ValueError(f"{path} holds games on another board size.")
+
+            record_struct = GameArchive.record_struct(dimensions)
+            for record in records:
+                archive_file.write(record_struct.pack(
+                    record.played_at,
+                    record.starter.value,
+                    record.winner.value,
+                    len(record.moves),
+                    bytes(record.moves),
+                ))
+
+    @staticmethod
+    def read(path: str | Path) -> Iterator[GameRecord]:
+        """The games of the archive at path, in the order they were added"""
+        with open(path, "rb") as archive_file:
+            record_struct = GameArchive.record_struct(
+                GameArchive._check_header(path, archive_file.read(GameArchive.HEADER.size))
+            )
+
+            while chunk:=archive_file.read(GameArchive.CHUNK_RECORDS * record_struct.size):
+                # A record cut short by a writer that was stopped is dropped
+                chunk = chunk[:len(chunk) - len(chunk) % record_struct.size]
+                for played_at, starter, winner, count, moves in record_struct.iter_unpack(chunk):
+                    yield GameRecord(
+                        Piece(starter), list(moves[:count]), Piece(winner), played_at
+                    )
+
+    @staticmethod
+    def count(path: str | Path) -> int:
+        """The number of games in the archive, from its size alone"""
+        record_struct = GameArchive.record_struct(GameArchive._read_dimensions(path))
+        return (Path(path).stat().st_size - GameArchive.HEADER.size) // record_struct.size
+
+    @staticmethod
+    def is_archive(path: str | Path) -> bool:
+        with open(path, "rb") as archive_file:
+            return archive_file.read(len(GameArchive.MAGIC)) == GameArchive.MAGIC
+
+    @staticmethod
+    def _read_dimensions(path: str | Path) -> int:
+        with open(path, "rb") as archive_file:
+            return GameArchive._check_header(path, archive_file.read(GameArchive.HEADER.size))
+
+    @staticmethod
+    def _check_header(path: str | Path, header: bytes) -> int:
+        if len(header) < GameArchive.HEADER.size:
+            raise ValueError(f"{path} is not a game archive.")
+        magic, dimensions = GameArchive.HEADER.unpack(header)
+        if magic != GameArchive.MAGIC:
+            raise ValueError(f"{path} is not a game archive.")
+        return dimensions
+
+def record_game(board: Board, path: str | Path | None) -> None:
+    """Appends the game played on board to the archive at path, if any"""
+    if path is None:
+        return
+    GameArchive.append(path, [GameRecord.from_board(board)], board.DIMENSIONS)
+
+def read_positions(
+            path: str | Path,
+            every: int = 1
+        ) -> Iterator[tuple[Board, GameRecord, int]]:
+    """
+    Every every'th position of each game in the archive, with its game and
+    the number of moves played, from the empty board to the final position
+
+    Each game is replayed one move at a time on a single board, which is
+    yielded after each move and changes once iteration goes on. Keep a
+    position with Board.from_board.
+    """
+    from board import Board
+
+    for record in GameArchive.read(path):
+        board = Board(record.starter)
+        for ply in range(len(record.moves) + 1):
+            if ply:
+                board.make_move(record.moves[ply - 1])
+            if ply % every == 0:
+                yield board, record, ply
+
+def read_bitboards(
+            path: str | Path,
+            every: int = 1
+        ) -> Iterator[tuple[int, int, Piece, GameRecord, int]]:
+    """
+    Like read_positions, but only the X and O bitboards and the player to
+    move of each position, without keeping up a Board
+
+    Much faster when the search and evaluation state of a board are not
+    needed, such as when counting or filtering millions of positions.
+    """
+    for record in GameArchive.read(path):
+        bits = [0, 0]
+        mover = 0 if record.starter == Piece.X else 1
+        for ply in range(len(record.moves) + 1):
+            if ply:
+                bits[mover] |= 1 << record.moves[ply - 1]
+                mover ^= 1
+            if ply % every == 0:
+                yield bits[0], bits[1], Piece.X if mover == 0 else Piece.O, record, ply
+
+def main(argv: list[str] | None = None) -> int:
+    parser = ArgumentParser(description="Summarizes or prints a game archive.")
+    parser.add_argument("archive", nargs="?", default=str(DEFAULT_RECORD_PATH))
+    parser.add_argument(
+        "--show", action="store_true",
+        help="Print the starter, winner and moves of every game"
+    )
+    args = parser.parse_args(argv)
+
+    from board import Board
+
+    totals = {"X": 0, "O": 0, "draw": 0}
+    positions = 0
+    for game_index, record in enumerate(GameArchive.read(args.archive)):
+        totals[str(record.winner) if record.winner != Piece.EMPTY else "draw"] += 1
+        positions += len(record.moves) + 1
+
+        if args.show:
+            moves = " ".join(map(Board.identifier_of, record.moves))
+            print(f"{game_index} {record.starter} {record.winner} {moves}")
+
+    print(
+        f"{sum(totals.values())} games, {positions} positions. " +
+        f"X won {totals['X']}, O won {totals['O']}, {totals['draw']} draws or unfinished"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+from __future__ import annotations
+from collections import OrderedDict
+from sys import getsizeof
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from board import Board
+
+class MoveCache:
+    """
+    A least recently used cache of generated child boards
+
+    Keyed by the Zobrist key of the parent board, holding at most
+    max_entries parents before the least recently used one is dropped
+    """
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        if max_entries <= 0:
+            raise ValueError("The cache must hold at least one entry.")
+
+        self.max_entries = max_entries
+        self.entries: OrderedDict[int, list[Board]] = OrderedDict()
+        self.entry_bytes: dict[int, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_held = 0
+
+    def get(self, board: Board) -> list[Board] | None:
+        children = self.entries.get(board.key)
+        if children is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(board.key)
+        return children
+
+    def put(self, board: Board, children: list[Board]) -> None:
+        if board.key in self.entries:
+            self._remove(board.key)
+
+        self.entries[board.key] = children
+        self.entry_bytes[board.key] = _size_of(children)
+        self.bytes_held += self.entry_bytes[board.key]
+
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drops every entry, counters are kept"""
+        self.entries.clear()
+        self.entry_bytes.clear()
+        self.bytes_held = 0
+
+    def _remove(self, key: int) -> None:
+        del self.entries[key]
+        self.bytes_held -= self.entry_bytes.pop(key)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes_held": self.bytes_held,
+        }
+
+    def __contains__(self, board: object) -> bool:
+        return getattr(board, "key", None) in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+def board_size(board: Board) -> int:
+    """
+    An estimate of the bytes a board holds on its own, leaving out the
+    window tables its evaluator shares with every other board
+    """
+    size = getsizeof(board) + getsizeof(board.history)
+    size += getsizeof(board.symmetric_keys)
+
+    # Each board holds its own copy of the window counts
+    evaluator = board.evaluator
+    size += getsizeof(evaluator)
+    size += getsizeof(evaluator.x_counts) + getsizeof(evaluator.o_counts)
+    size += getsizeof(evaluator.x_threats) + getsizeof(evaluator.o_threats)
+    return size
+
+def _size_of(children: list[Board]) -> int:
+    """An estimate of the bytes held by a list of boards"""
+    return getsizeof(children) + sum(board_size(child) for child in children)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any
+from bitboard import neighbours
+
+if TYPE_CHECKING:
+    from board import Board
+
+class MoveOrderer:
+    """
+    Orders the candidate moves of a position, see Board.candidate_moves, so
+    the ones most likely to cause a cutoff are searched first
+
+    Moves are tried in this order:
+        The best move stored for the position by the previous iteration
+        Killer moves, which recently caused a cutoff at the same ply
+        Moves by their history score, with moves next to a piece first
+    """
+
+    KILLERS_PER_PLY = 2
+
+    def __init__(self, adjacency: bool = True) -> None:
+        self.adjacency = adjacency
+
+        # Keyed by ply, the number of moves played on the board
+        self.killers: dict[int, list[int]] = {}
+        # Keyed by position, grows by depth squared on every cutoff
+        self.history: dict[int, int] = {}
+
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self) -> None:
+        """Ages the history scores and resets the cutoff counters"""
+        for position in self.history:
+            self.history[position] //= 2
+
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def clear(self) -> None:
+        self.killers.clear()
+        self.history.clear()
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def order(self, board: Board, pv_move: int | None = None) -> list[int]:
+        killers = self.killers.get(len(board.history), [])
+        history = self.history
+
+        near = 0
+        if self.adjacency:
+            near = neighbours(board.occupied, board.DIMENSIONS)
+
+        def score(position: int) -> tuple[int, int, int]:
+            if position == pv_move:
+                return (2, 0, 0)
+            if position in killers:
+                return (1, -killers.index(position), 0)
+            return (0, history.get(position, 0), (near >> position) & 1)
+
+        # Sorting is stable, so ties keep their row-major order
+        return sorted(board.candidate_moves, key=score, reverse=True)
+
+    def record_cutoff(
+                self,
+                board: Board,
+                position: int,
+                layers_remaining: int,
+                move_index: int
+            ) -> None:
+        """Rewards a move that caused a cutoff as the move_index'th move"""
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+
+        killers = self.killers.setdefault(len(board.history), [])
+        if position not in killers:
+            killers.insert(0, position)
+            del killers[MoveOrderer.KILLERS_PER_PLY:]
+
+        self.history[position] = (
+            self.history.get(position, 0) + layers_remaining * layers_remaining
+        )
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """The share of cutoffs caused by the first move searched"""
+        if not self.cutoffs:
+            return 0.0
+        return self.first_move_cutoffs / self.cutoffs
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "cutoffs": self.cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate,
+        }
@@ -0,0 +1,89 @@
+from __future__ import annotations
+import mmap
+import os
+import struct
+from pathlib import Path
+
+DEFAULT_BOOK_PATH = Path(__file__).resolve().parent.parent / "books" / "opening.book"
+
+class BookEntry:
+
+    def __init__(self, move: int, depth: int, value: int) -> None:
+        self.move = move
+        self.depth = depth
+        self.value = value
+
+class OpeningBook:
+    """
+    Book moves stored as fixed size records sorted by the canonical Zobrist
+    key of the position, see Board.canonical
+
+    The file is memory-mapped and searched with a binary search, so loading
+    a book costs nothing and a lookup reads only a few records
+    """
+
+    MAGIC = b"4BK2"
+    # Magic and number of records
+    HEADER = struct.Struct("<4sI")
+    # Key, move, depth searched and value for the player to move
+    RECORD = struct.Struct("<QBBi")
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+
+        with open(self.path, "rb") as book_file:
+            self.data = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count = OpeningBook.HEADER.unpack_from(self.data, 0)
+        if magic != OpeningBook.MAGIC:
+            self.data.close()
+            raise ValueError(f"{self.path} is not an opening book.")
+
+    @classmethod
+    def load(cls, path: str | Path) -> OpeningBook | None:
+        """The book at path, or None if there is no book there"""
+        if not Path(path).exists():
+            return None
+        return cls(path)
+
+    def close(self) -> None:
+        self.data.close()
+
+    def _record(self, index: int) -> tuple[int, int, int, int]:
+        return OpeningBook.RECORD.unpack_from(
+            self.data,
+            OpeningBook.HEADER.size + index * OpeningBook.RECORD.size
+        )
+
+    def lookup(self, key: int) -> BookEntry | None:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, move, depth, value = self._record(middle)
+
+            if record_key == key:
+                return BookEntry(move, depth, value)
+            if record_key < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+    def __len__(self) -> int:
+        return self.count
+
+    @staticmethod
+    def write(path: str | Path, entries: dict[int, BookEntry]) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        # Replacing the file keeps books that are already mapped intact
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as book_file:
+            book_file.write(OpeningBook.HEADER.pack(OpeningBook.MAGIC, len(entries)))
+            for key in sorted(entries):
+                entry = entries[key]
+                book_file.write(OpeningBook.RECORD.pack(
+                    key, entry.move, entry.depth, entry.value
+                ))
+        os.replace(temporary_path, path)
@@ -1,20 +0,0 @@
-import collections.abc
-
-class OrderedSet(collections.abc.Set):
-    def __init__(self, iterable=()):
-        self.d = collections.OrderedDict.fromkeys(iterable)
-
-    def __len__(self):
-        return len(self.d)
-
-    def __contains__(self, element):
-        return element in self.d
-
-    def __iter__(self):
-        return iter(self.d)
-
-    def __str__(self):
-        return str([i for i in self.d])
-
-    def __repr__(self):
-        return str(self)
\ No newline at end of file
@@ -0,0 +1,259 @@
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing import Value
+from multiprocessing.sharedctypes import Synchronized
+from time import time
+from typing import TYPE_CHECKING
+from piece import Piece
+import ab_prune_utils
+from ab_prune_utils import (
+    Move, SearchLimits, SearchTimeout, MOVE_ORDERER, negamax, search
+)
+
+if TYPE_CHECKING:
+    from board import Board
+
+# The best root value found so far by any worker, whether the search was
+# stopped, and the nodes searched by every worker, set by _init_worker
+_SHARED_ALPHA: Synchronized | None = None
+_SHARED_STOP: Synchronized | None = None
+_SHARED_NODES: Synchronized | None = None
+
+def _init_worker(
+            shared_alpha: Synchronized,
+            shared_stop: Synchronized,
+            shared_nodes: Synchronized
+        ) -> None:
+    global _SHARED_ALPHA, _SHARED_STOP, _SHARED_NODES
+    _SHARED_ALPHA = shared_alpha
+    _SHARED_STOP = shared_stop
+    _SHARED_NODES = shared_nodes
+
+class _SharedLimits(SearchLimits):
+    """
+    The limits of one worker, whose stop flag and node budget are shared by
+    every worker of the search
+
+    Nodes are added to the shared count every CHECK_INTERVAL nodes, when
+    the limits are checked, so the budget can be overshot by that many
+    nodes per worker.
+    """
+
+    def __init__(self, deadline: float | None, node_budget: int | None) -> None:
+        super().__init__(deadline, node_budget)
+        self.counted = 0
+
+    def visit(self, count: int = 1) -> None:
+        previous = self.nodes
+        self.nodes += count
+        interval = SearchLimits.CHECK_INTERVAL
+        if previous // interval == self.nodes // interval:
+            return
+
+        total = self.count_nodes()
+        assert _SHARED_STOP is not None
+        if _SHARED_STOP.value:
+            raise SearchTimeout("The search was stopped.")
+        if self.node_budget is not None and total > self.node_budget:
+            raise SearchTimeout("The node budget ran out.")
+        if self.deadline is not None and time() >= self.deadline:
+            raise SearchTimeout("The deadline passed.")
+
+    def count_nodes(self) -> int:
+        """Adds the nodes not yet counted to the shared count and returns it"""
+        assert _SHARED_NODES is not None
+        with _SHARED_NODES.get_lock():
+            _SHARED_NODES.value += self.nodes - self.counted
+            total = _SHARED_NODES.value
+        self.counted = self.nodes
+        return total
+
+def _search_root_move(
+            board_class: type[Board],
+            starter: Piece,
+            history: list[int],
+            position: int,
+            depth: int,
+            deadline: float | None,
+            node_budget: int | None,
+        ) -> tuple[float, bool] | None:
+    """
+    Searches a single root move in a worker process
+
+    Returns the value of the move for the player to move at the root and
+    whether that value is exact. Returns None if the limits ran out first
+    or the search was stopped. node_budget is for the nodes of every
+    worker together.
+    """
+    assert _SHARED_ALPHA is not None and _SHARED_STOP is not None
+    if _SHARED_STOP.value:
+        return None
+
+    board = board_class(starter)
+    for played in history:
+        board.make_move(played)
+
+    limits = _SharedLimits(deadline, node_budget)
+
+    # Moves that can't beat the best value so far only need to prove it
+    alpha = _SHARED_ALPHA.value
+    board.make_move(position)
+    try:
+        value = -negamax(
+            board, float('-inf'), -alpha, depth - 1, limits
+        ).value
+    except SearchTimeout:
+        # The whole search is abandoned, the other workers can stop too
+        _SHARED_STOP.value = True
+        return None
+    finally:
+        limits.count_nodes()
+
+    exact = value > alpha
+    if exact:
+        with _SHARED_ALPHA.get_lock():
+            if value > _SHARED_ALPHA.value:
+                _SHARED_ALPHA.value = value
+
+    return value, exact
+
+class ParallelSearcher:
+    """
+    Splits the moves at the root of a search across a pool of processes
+
+    The first move is searched in this process to find a good alpha (young
+    brothers wait), then the remaining moves are searched by the pool.
+    Workers share the best value found so far, so each one only has to
+    prove its move is worse than it. With one worker the regular search is
+    used, so results are deterministic.
+
+    Stopping the limits of a search stops every worker within
+    POLL_INTERVAL seconds, and the node budget is spent by all the workers
+    together.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, workers: int) -> None:
+        if workers < 1:
+            raise ValueError("There must be at least one worker.")
+
+        self.workers = workers
+        self.shared_alpha: Synchronized = Value('d', float('-inf'))
+        self.shared_stop: Synchronized = Value('b', False)
+        self.shared_nodes: Synchronized = Value('q', 0)
+        self.pool: ProcessPoolExecutor | None = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(self.shared_alpha, self.shared_stop, self.shared_nodes)
+            )
+        return self.pool
+
+    def shutdown(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def search(
+                self,
+                board: Board,
+                depth: int,
+                limits: SearchLimits | None = None
+            ) -> Move:
+        """Searches like ab_prune_utils.search with the root split up"""
+        if (
+            self.workers == 1 or
+            depth <= 1 or
+            board.check_winners() != Piece.EMPTY or
+            board.count_empty() <= 1
+        ):
+            return search(board, depth, limits)
+
+        ab_prune_utils.TRANSPOSITION_TABLE.new_search()
+        MOVE_ORDERER.new_search()
+
+        key, symmetry = board.table_key()
+        entry = ab_prune_utils.TRANSPOSITION_TABLE.probe(key)
+        pv_move = None
+        if entry is not None:
+            pv_move = board.from_canonical(entry.best_move, symmetry)
+        moves = MOVE_ORDERER.order(board, pv_move)
+
+        # The eldest brother is searched first to set alpha
+        moves_played = len(board.history)
+        board.make_move(moves[0])
+        try:
+            first_value = -negamax(
+                board, float('-inf'), float('inf'), depth - 1, limits
+            ).value
+        finally:
+            # Also takes back the moves of an abandoned search
+            while len(board.history) > moves_played:
+                board.undo_move()
+
+        best_move = Move(first_value, moves[0])
+        self.shared_alpha.value = first_value
+
+        deadline = limits.deadline if limits is not None else None
+        node_budget = limits.node_budget if limits is not None else None
+        self.shared_stop.value = False
+        self.shared_nodes.value = limits.nodes if limits is not None else 0
+
+        pool = self._get_pool()
+        futures: list[Future] = [
+            pool.submit(
+                _search_root_move, type(board), board.order[0],
+                board.history.copy(), position, depth, deadline, node_budget
+            )
+            for position in moves[1:]
+        ]
+
+        try:
+            self._wait(futures, limits)
+        finally:
+            if limits is not None:
+                limits.nodes = self.shared_nodes.value
+
+        # Ties go to the earliest move in search order
+        for position, future in zip(moves[1:], futures):
+            value, exact = future.result()
+            if exact and value > best_move.value:
+                best_move = Move(value, position)
+
+        ab_prune_utils.TRANSPOSITION_TABLE.store(
+            key, depth, best_move.value, float('-inf'), float('inf'),
+            board.to_canonical(best_move.position, symmetry)
+        )
+
+        return best_move
+
+    def _wait(self, futures: list[Future], limits: SearchLimits | None) -> None:
+        """
+        Waits for every root move, raising SearchTimeout and stopping the
+        other workers once one of them runs out of limits or the limits are
+        stopped
+        """
+        pending = set(futures)
+        while pending:
+            done, pending = wait(
+                pending, ParallelSearcher.POLL_INTERVAL, FIRST_COMPLETED
+            )
+            timed_out = any(future.result() is None for future in done)
+            if timed_out or (limits is not None and limits.stop_requested):
+                self.shared_stop.value = True
+                for future in pending:
+                    future.cancel()
+                wait(pending)
+                raise SearchTimeout("The search was stopped or ran out of limits.")
+
+# Searchers by worker count, so pools are reused between moves
+SEARCHERS: dict[int, ParallelSearcher] = {}
+
+def get_searcher(workers: int) -> ParallelSearcher:
+    if workers not in SEARCHERS:
+        SEARCHERS[workers] = ParallelSearcher(workers)
+    return SEARCHERS[workers]
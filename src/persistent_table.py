@@ -0,0 +1,151 @@
+from __future__ import annotations
+import mmap
+import os
+import struct
+from pathlib import Path
+from transposition import Bound, ReplacementPolicy, TableEntry, TranspositionTable
+
+class PersistentTranspositionTable(TranspositionTable):
+    """
+    A transposition table kept in a memory-mapped file
+
+    Results survive the process and are shared by every process that maps
+    the same file. Each slot holds two 64-bit words, the packed entry and
+    the key XORed with it. Writes take no locks, instead a reader only
+    accepts a slot whose words agree with each other, so a slot torn by two
+    processes writing at once reads as empty rather than as a wrong entry.
+    """
+
+    MAGIC = b"4TT1"
+    # Magic and number of slots
+    HEADER = struct.Struct("<4sI")
+    # Key XOR data, then data
+    SLOT = struct.Struct("<QQ")
+
+    NO_MOVE = 0xFF
+    VALUE_OFFSET = 1 << 31
+
+    def __init__(
+                self,
+                path: str | Path,
+                size: int = 1 << 20,
+                policy: ReplacementPolicy = ReplacementPolicy.DEPTH_PREFERRED
+            ) -> None:
+        """
+        Maps the table at path, creating it with size slots if it does not
+        exist. An existing table keeps the size it was created with.
+        """
+        self.path = Path(path)
+
+        if not self.path.exists():
+            if size <= 0:
+                raise ValueError("The table must have at least one slot.")
+            PersistentTranspositionTable._create(self.path, size)
+
+        with open(self.path, "r+b") as table_file:
+            self.data = mmap.mmap(table_file.fileno(), 0)
+
+        magic, size = PersistentTranspositionTable.HEADER.unpack_from(self.data, 0)
+        if magic != PersistentTranspositionTable.MAGIC:
+            self.data.close()
+            raise ValueError(f"{self.path} is not a transposition table.")
+
+        self.size = size
+        self.policy = policy
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    @staticmethod
+    def _create(path: Path, size: int) -> None:
+        """
+        Creates an empty table at path unless one is already there
+
+        The table is built under a name of this process's own and then
+        linked into place, which fails if another process got there first,
+        so a table is never seen half written or truncated while mapped
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(temporary_path, "wb") as table_file:
+                table_file.write(PersistentTranspositionTable.HEADER.pack(
+                    PersistentTranspositionTable.MAGIC, size
+                ))
+                table_file.truncate(
+                    PersistentTranspositionTable.HEADER.size +
+                    size * PersistentTranspositionTable.SLOT.size
+                )
+            os.link(temporary_path, path)
+        except FileExistsError:
+            # Another process created the table, use theirs
+            pass
+        finally:
+            temporary_path.unlink(missing_ok=True)
+
+    def new_search(self) -> None:
+        # Only eight bits of the generation are stored
+        self.generation = (self.generation + 1) % 256
+
+    def clear(self) -> None:
+        start = PersistentTranspositionTable.HEADER.size
+        self.data[start:] = bytes(len(self.data) - start)
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def flush(self) -> None:
+        self.data.flush()
+
+    def close(self) -> None:
+        self.data.close()
+
+    def _offset(self, index: int) -> int:
+        return (
+            PersistentTranspositionTable.HEADER.size +
+            index * PersistentTranspositionTable.SLOT.size
+        )
+
+    def _read(self, index: int) -> TableEntry | None:
+        check, data = PersistentTranspositionTable.SLOT.unpack_from(
+            self.data, self._offset(index)
+        )
+        if not data:
+            return None
+
+        move = (data >> 48) & 0xFF
+        return TableEntry(
+            check ^ data,
+            (data >> 32) & 0xFF,
+            (data & 0xFFFFFFFF) - PersistentTranspositionTable.VALUE_OFFSET,
+            Bound((data >> 40) & 0xFF),
+            None if move == PersistentTranspositionTable.NO_MOVE else move,
+            data >> 56,
+        )
+
+    def _write(self, index: int, entry: TableEntry) -> None:
+        value = int(max(
+            -PersistentTranspositionTable.VALUE_OFFSET,
+            min(PersistentTranspositionTable.VALUE_OFFSET - 1, entry.value)
+        ))
+        move = (
+            PersistentTranspositionTable.NO_MOVE if entry.best_move is None
+            else entry.best_move
+        )
+
+        data = (
+            (value + PersistentTranspositionTable.VALUE_OFFSET) |
+            (min(entry.depth, 0xFF) << 32) |
+            (entry.bound.value << 40) |
+            (move << 48) |
+            (entry.generation << 56)
+        )
+        PersistentTranspositionTable.SLOT.pack_into(
+            self.data, self._offset(index), (entry.key ^ data) & 0xFFFFFFFFFFFFFFFF, data
+        )
+
+    def __len__(self) -> int:
+        return sum(
+            1 for index in range(self.size) if self._read(index) is not None
+        )
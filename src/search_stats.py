@@ -0,0 +1,97 @@
+from __future__ import annotations
+import json
+from typing import Any
+
+class SearchStats:
+    """
+    Counters for one iterative deepening search
+
+    Everything is collected once per depth from counters the search keeps
+    anyway, so passing a SearchStats adds nothing to the cost of a node and
+    leaving it out costs nothing at all
+    """
+
+    def __init__(self) -> None:
+        self.nodes = 0
+        self.depth_reached = 0
+        self.aborted = False
+
+        self.nodes_per_depth: list[int] = []
+        self.time_per_depth: list[float] = []
+
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+
+        # The outcome, distance, nodes and time of an exact endgame solve,
+        # see EndgameResult, when the position was solved instead of searched
+        self.endgame: dict[str, Any] | None = None
+        # The plies, nodes and time of the threat search when it found a
+        # forced win, which is played without searching
+        self.threat_win: dict[str, Any] | None = None
+
+    def record_depth(
+                self,
+                nodes: int,
+                seconds: float,
+                cutoffs: int,
+                first_move_cutoffs: int,
+                tt_probes: int,
+                tt_hits: int,
+            ) -> None:
+        """Adds the counts of a depth that finished searching"""
+        self.depth_reached += 1
+        self.nodes += nodes
+        self.nodes_per_depth.append(nodes)
+        self.time_per_depth.append(seconds)
+
+        self.cutoffs += cutoffs
+        self.first_move_cutoffs += first_move_cutoffs
+        self.tt_probes += tt_probes
+        self.tt_hits += tt_hits
+
+    @property
+    def elapsed(self) -> float:
+        return sum(self.time_per_depth)
+
+    @property
+    def branching_factor(self) -> float:
+        """The effective branching factor, nodes of the last depth over the one before"""
+        if len(self.nodes_per_depth) < 2 or not self.nodes_per_depth[-2]:
+            return 0.0
+        return self.nodes_per_depth[-1] / self.nodes_per_depth[-2]
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        if not self.cutoffs:
+            return 0.0
+        return self.first_move_cutoffs / self.cutoffs
+
+    @property
+    def tt_hit_rate(self) -> float:
+        if not self.tt_probes:
+            return 0.0
+        return self.tt_hits / self.tt_probes
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "nodes": self.nodes,
+            "depth_reached": self.depth_reached,
+            "aborted": self.aborted,
+            "elapsed": self.elapsed,
+            "nodes_per_second": self.nodes / self.elapsed if self.elapsed else 0.0,
+            "nodes_per_depth": self.nodes_per_depth,
+            "time_per_depth": self.time_per_depth,
+            "branching_factor": self.branching_factor,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_hit_rate": self.tt_hit_rate,
+            "endgame": self.endgame,
+            "threat_win": self.threat_win,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
@@ -0,0 +1,221 @@
+from __future__ import annotations
+import json
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from random import Random
+from time import time
+from typing import Any
+from piece import Piece
+from board import Board
+import ab_prune_utils
+from ab_prune_utils import (
+    SearchLimits, MOVE_ORDERER, iterative_deepening, set_transposition_table
+)
+from persistent_table import PersistentTranspositionTable
+from game_record import GameArchive, GameRecord
+from search_stats import SearchStats
+
+class PlayerConfig:
+    """The search limits one side plays with"""
+
+    def __init__(
+                self,
+                max_depth: int = Board.MAX_DEPTH,
+                max_time: float = Board.MAX_TIME,
+                node_budget: int | None = None
+            ) -> None:
+        self.max_depth = max_depth
+        self.max_time = max_time
+        self.node_budget = node_budget
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "max_depth": self.max_depth,
+            "max_time": self.max_time,
+            "node_budget": self.node_budget,
+        }
+
+def play_game(
+            game_index: int,
+            x_config: PlayerConfig,
+            o_config: PlayerConfig,
+            opening: str = "",
+            random_plies: int = 0,
+            seed: int = 0,
+            starter: Piece = Piece.X,
+            table_path: str | None = None,
+        ) -> dict[str, Any]:
+    """
+    Plays one engine against engine game without printing anything
+
+    The game starts from the opening moves followed by random_plies random
+    moves, drawn from a generator seeded by seed and game_index. With a
+    table_path the persistent table there is used and kept, otherwise every
+    game starts with an empty table.
+    """
+    if table_path is None:
+        ab_prune_utils.TRANSPOSITION_TABLE.clear()
+    else:
+        _use_persistent_table(table_path)
+    MOVE_ORDERER.clear()
+    Board.POSSIBLE_MOVES_CACHE.clear()
+
+    board = Board(starter)
+    board.play_moves(opening)
+
+    rng = Random(f"{seed}-{game_index}")
+    for _ in range(random_plies):
+        if board.check_winners() != Piece.EMPTY or board.count_empty() == 0:
+            break
+        board.make_move(rng.choice(list(board.empty_squares)))
+
+    opening_moves = len(board.history)
+    move_times: list[float] = []
+    move_nodes: list[int] = []
+    move_depths: list[int] = []
+
+    while (winner:=board.check_winners()) == Piece.EMPTY and board.count_empty() != 0:
+        config = x_config if board.turn == Piece.X else o_config
+
+        start = time()
+        limits = SearchLimits(start + config.max_time, config.node_budget)
+        stats = SearchStats()
+        best_move = iterative_deepening(
+            board, config.max_time, config.max_depth,
+            limits=limits, stats=stats
+        )
+        assert best_move.position is not None
+
+        move_times.append(time() - start)
+        move_nodes.append(limits.nodes)
+        move_depths.append(stats.depth_reached)
+
+        board.make_move(best_move.position)
+
+    moves = [Board.identifier_of(position) for position in board.history]
+    return {
+        "game": game_index,
+        "starter": str(starter),
+        "opening": moves[:opening_moves],
+        "moves": moves[opening_moves:],
+        "winner": str(winner) if winner != Piece.EMPTY else None,
+        "move_times": move_times,
+        "move_nodes": move_nodes,
+        "move_depths": move_depths,
+        "x": x_config.to_dict(),
+        "o": o_config.to_dict(),
+    }
+
+def _use_persistent_table(table_path: str) -> None:
+    table = ab_prune_utils.TRANSPOSITION_TABLE
+    if (
+        not isinstance(table, PersistentTranspositionTable) or
+        table.path != Path(table_path)
+    ):
+        set_transposition_table(PersistentTranspositionTable(table_path))
+
+def run_batch(
+            games: int,
+            output: str,
+            x_config: PlayerConfig,
+            o_config: PlayerConfig,
+            workers: int = 1,
+            opening: str = "",
+            random_plies: int = 0,
+            seed: int = 0,
+            table_path: str | None = None,
+            record_path: str | None = None,
+        ) -> dict[str, int]:
+    """
+    Plays games across worker processes, appending each result to the
+    output JSONL file as soon as its game finishes, and its moves to the game
+    archive at record_path if there is one
+
+    Returns the number of wins for each side and of draws
+    """
+    totals = {"X": 0, "O": 0, "draw": 0}
+
+    if table_path is not None:
+        # Created once here rather than by every worker at the same time
+        PersistentTranspositionTable(table_path).close()
+
+    with (
+        open(output, "a") as output_file,
+        ProcessPoolExecutor(workers) as pool
+    ):
+        futures = [
+            pool.submit(
+                play_game, game_index, x_config, o_config,
+                opening, random_plies, seed, Piece.X, table_path
+            )
+            for game_index in range(games)
+        ]
+
+        for future in as_completed(futures):
+            result = future.result()
+            totals[result["winner"] or "draw"] += 1
+
+            output_file.write(json.dumps(result) + "\n")
+            output_file.flush()
+
+            if record_path is not None:
+                GameArchive.append(record_path, [_record_of(result)], Board.DIMENSIONS)
+
+    return totals
+
+def _record_of(result: dict[str, Any]) -> GameRecord:
+    board = Board(Piece[result["starter"]])
+    board.play_moves(" ".join(result["opening"] + result["moves"]))
+    return GameRecord.from_board(board)
+
+def main(argv: list[str] | None = None) -> None:
+    parser = ArgumentParser(description="Plays the engine against itself.")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", default="self_play.jsonl")
+    parser.add_argument("--x-depth", type=int, default=Board.MAX_DEPTH)
+    parser.add_argument("--x-time", type=float, default=Board.MAX_TIME)
+    parser.add_argument("--x-nodes", type=int, default=None)
+    parser.add_argument("--o-depth", type=int, default=Board.MAX_DEPTH)
+    parser.add_argument("--o-time", type=float, default=Board.MAX_TIME)
+    parser.add_argument("--o-nodes", type=int, default=None)
+    parser.add_argument(
+        "--opening", default="",
+        help="Space separated moves every game starts with, such as 'D4 E5'"
+    )
+    parser.add_argument(
+        "--random-plies", type=int, default=0,
+        help="Random moves played after the opening"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--table", metavar="PATH",
+        help="Share a persistent transposition table between games and runs"
+    )
+    parser.add_argument(
+        "--record", metavar="PATH",
+        help="Also append every game to the game archive at PATH"
+    )
+    args = parser.parse_args(argv)
+
+    totals = run_batch(
+        args.games,
+        args.output,
+        PlayerConfig(args.x_depth, args.x_time, args.x_nodes),
+        PlayerConfig(args.o_depth, args.o_time, args.o_nodes),
+        args.workers,
+        args.opening,
+        args.random_plies,
+        args.seed,
+        args.table,
+        args.record,
+    )
+
+    print(
+        f"X won {totals['X']}, O won {totals['O']}, " +
+        f"{totals['draw']} draws. Results are in {args.output}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from functools import lru_cache
+from bitboard import position_of, coordinates_of, iterate_bits
+
+# Where each symmetry sends the cell (row, col) of a board with n cells a side
+SYMMETRIES = (
+    lambda row, col, n: (row, col),                  # identity
+    lambda row, col, n: (col, n - 1 - row),          # rotate 90
+    lambda row, col, n: (n - 1 - row, n - 1 - col),  # rotate 180
+    lambda row, col, n: (n - 1 - col, row),          # rotate 270
+    lambda row, col, n: (n - 1 - row, col),          # flip rows
+    lambda row, col, n: (row, n - 1 - col),          # flip columns
+    lambda row, col, n: (col, row),                  # transpose
+    lambda row, col, n: (n - 1 - col, n - 1 - row),  # anti-transpose
+)
+
+@lru_cache
+def symmetry_permutations(dimensions: int) -> tuple[tuple[int, ...], ...]:
+    """For each symmetry, the position every position is sent to"""
+    return tuple(
+        tuple(
+            position_of(
+                *symmetry(*coordinates_of(position, dimensions), dimensions),
+                dimensions
+            )
+            for position in range(dimensions * dimensions)
+        )
+        for symmetry in SYMMETRIES
+    )
+
+@lru_cache
+def inverse_permutations(dimensions: int) -> tuple[tuple[int, ...], ...]:
+    """For each symmetry, the position every position came from"""
+    inverses: list[tuple[int, ...]] = []
+    for permutation in symmetry_permutations(dimensions):
+        inverse = [0] * len(permutation)
+        for position, target in enumerate(permutation):
+            inverse[target] = position
+        inverses.append(tuple(inverse))
+    return tuple(inverses)
+
+# 8x8 BITBOARD TRANSFORMS
+# Each row is one byte of the bitboard, so whole boards can be flipped with a
+# handful of shifts and masks instead of moving one bit at a time
+
+MASK_64 = (1 << 64) - 1
+
+def flip_rows(bits: int) -> int:
+    return int.from_bytes(bits.to_bytes(8, "little"), "big")
+
+def flip_columns(bits: int) -> int:
+    bits = ((bits >> 1) & 0x5555555555555555) | ((bits & 0x5555555555555555) << 1)
+    bits = ((bits >> 2) & 0x3333333333333333) | ((bits & 0x3333333333333333) << 2)
+    bits = ((bits >> 4) & 0x0F0F0F0F0F0F0F0F) | ((bits & 0x0F0F0F0F0F0F0F0F) << 4)
+    return bits & MASK_64
+
+def transpose(bits: int) -> int:
+    swap = 0x0F0F0F0F00000000 & (bits ^ (bits << 28))
+    bits ^= swap ^ (swap >> 28)
+    swap = 0x3333000033330000 & (bits ^ (bits << 14))
+    bits ^= swap ^ (swap >> 14)
+    swap = 0x5500550055005500 & (bits ^ (bits << 7))
+    bits ^= swap ^ (swap >> 7)
+    return bits & MASK_64
+
+def transform_bits(bits: int, symmetry: int, dimensions: int) -> int:
+    """Applies one of the SYMMETRIES to a bitboard"""
+    if dimensions != 8:
+        permutation = symmetry_permutations(dimensions)[symmetry]
+        transformed = 0
+        for position in iterate_bits(bits):
+            transformed |= 1 << permutation[position]
+        return transformed
+
+    match(symmetry):
+        case 0:
+            return bits
+        case 1:
+            return flip_columns(transpose(bits))
+        case 2:
+            return flip_rows(flip_columns(bits))
+        case 3:
+            return flip_rows(transpose(bits))
+        case 4:
+            return flip_rows(bits)
+        case 5:
+            return flip_columns(bits)
+        case 6:
+            return transpose(bits)
+        case 7:
+            return flip_rows(flip_columns(transpose(bits)))
+        case _:
+            raise ValueError("There are only 8 symmetries.")
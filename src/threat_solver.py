@@ -0,0 +1,144 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any
+from piece import Piece
+from bitboard import iterate_bits, count_bits
+
+if TYPE_CHECKING:
+    from board import Board
+    from ab_prune_utils import SearchLimits
+
+class ThreatSolver:
+    """
+    Looks for a forced win made only of threats, windows one piece away from
+    a line, for the player to move
+
+    The attacker only plays moves that make a threat, so the defender's only
+    reply is to block it. The attacker wins once they have threats on two
+    cells at once. With a single reply to every attacker move, sequences far
+    deeper than the main search are cheap to check.
+
+    A failed search only shows there is no win by threats alone, the
+    position may still be won with quiet moves.
+    """
+
+    # Positions without a win kept between searches before starting over
+    MAX_REFUTED = 1 << 16
+
+    def __init__(self, node_budget: int = 20_000) -> None:
+        self.node_budget = node_budget
+
+        # Keyed by Zobrist key, the most plies a position has no win within
+        self.refuted: dict[int, int] = {}
+
+        self.nodes = 0
+        self.wins = 0
+        self._node_limit = 0
+        self._exhausted = False
+        self._limits: SearchLimits | None = None
+
+    def new_search(self) -> None:
+        if len(self.refuted) > ThreatSolver.MAX_REFUTED:
+            self.refuted.clear()
+        self.nodes = 0
+        self.wins = 0
+
+    def clear(self) -> None:
+        self.refuted.clear()
+        self.nodes = 0
+        self.wins = 0
+
+    def solve(
+                self,
+                board: Board,
+                max_plies: int,
+                node_budget: int | None = None,
+                limits: SearchLimits | None = None
+            ) -> list[int] | None:
+        """
+        The moves of a forced win for the player to move within max_plies,
+        or None if none was found
+
+        The moves alternate between the attacker and the defender's forced
+        blocks, ending with the winning move. The search gives up after
+        node_budget nodes, or the solver's node_budget when None, or once
+        the limits run out, leaving the board as it was.
+        """
+        from ab_prune_utils import SearchTimeout
+
+        if board.check_winners() != Piece.EMPTY:
+            return None
+
+        self._node_limit = self.nodes + (
+            self.node_budget if node_budget is None else node_budget
+        )
+        self._exhausted = False
+        self._limits = limits
+
+        moves_played = len(board.history)
+        try:
+            line = self._attack(board, max_plies)
+        except SearchTimeout:
+            while len(board.history) > moves_played:
+                board.undo_move()
+            return None
+        finally:
+            self._limits = None
+        if line is not None:
+            self.wins += 1
+        return line
+
+    def _attack(self, board: Board, plies: int) -> list[int] | None:
+        self.nodes += 1
+        if self._limits is not None:
+            self._limits.visit()
+
+        attacker = board.turn
+        evaluator = board.evaluator
+        occupied = board.occupied
+
+        if wins:=evaluator.threat_cells(attacker, occupied):
+            return [next(iterate_bits(wins))]
+
+        # A threat, its block and the win take three plies
+        if plies < 3 or self.refuted.get(board.key, -1) >= plies:
+            return None
+        if self.nodes > self._node_limit:
+            self._exhausted = True
+            return None
+
+        # A threat of the defender must be blocked, and the block must make
+        # a threat for the attack to go on
+        moves = evaluator.threat_moves(attacker, occupied)
+        if blocks:=evaluator.threat_cells(Piece.other(attacker), occupied):
+            moves &= blocks if count_bits(blocks) == 1 else 0
+
+        for position in iterate_bits(moves):
+            board.make_move(position)
+            replies = evaluator.threat_cells(attacker, board.occupied)
+
+            line = None
+            if count_bits(replies) > 1:
+                # Only one of the threats can be blocked
+                block, win = list(iterate_bits(replies))[:2]
+                line = [position, block, win]
+            else:
+                reply = next(iterate_bits(replies))
+                board.make_move(reply)
+                if (rest:=self._attack(board, plies - 2)) is not None:
+                    line = [position, reply] + rest
+                board.undo_move()
+
+            board.undo_move()
+            if line is not None:
+                return line
+
+        if not self._exhausted:
+            self.refuted[board.key] = plies
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "nodes": self.nodes,
+            "wins": self.wins,
+            "refuted": len(self.refuted),
+        }
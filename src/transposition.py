@@ -0,0 +1,158 @@
+from __future__ import annotations
+from enum import Enum
+
+class Bound(Enum):
+    """How a stored value relates to the true value of a position"""
+
+    EXACT = 0
+    # The true value is at least the stored value (it failed high)
+    LOWER = 1
+    # The true value is at most the stored value (it failed low)
+    UPPER = 2
+
+class ReplacementPolicy(Enum):
+
+    # Keep the deeper result when two positions share a slot
+    DEPTH_PREFERRED = 0
+    # The newest result always wins its slot
+    ALWAYS_REPLACE = 1
+
+class TableEntry:
+
+    __slots__ = ("key", "depth", "value", "bound", "best_move", "generation")
+
+    def __init__(
+                self,
+                key: int,
+                depth: int,
+                value: float,
+                bound: Bound,
+                best_move: int | None,
+                generation: int,
+            ) -> None:
+        self.key = key
+        self.depth = depth
+        self.value = value
+        self.bound = bound
+        self.best_move = best_move
+        self.generation = generation
+
+class TranspositionTable:
+    """
+    A fixed size table of search results indexed by Zobrist key
+
+    Each key maps to a single slot, so the table never holds more than size
+    entries. When two positions share a slot the replacement policy decides
+    which one is kept.
+    """
+
+    def __init__(
+                self,
+                size: int = 1 << 18,
+                policy: ReplacementPolicy = ReplacementPolicy.DEPTH_PREFERRED
+            ) -> None:
+        if size <= 0:
+            raise ValueError("The table must have at least one slot.")
+
+        self.size = size
+        self.policy = policy
+        self.entries: list[TableEntry | None] = [None] * size
+        self.generation = 0
+
+        # Lookups made, and lookups that returned a usable value
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self) -> None:
+        """Marks existing entries as old so deeper results can be replaced"""
+        self.generation += 1
+
+    def clear(self) -> None:
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    @property
+    def hit_rate(self) -> float:
+        if not self.probes:
+            return 0.0
+        return self.hits / self.probes
+
+    def _read(self, index: int) -> TableEntry | None:
+        return self.entries[index]
+
+    def _write(self, index: int, entry: TableEntry) -> None:
+        self.entries[index] = entry
+
+    def probe(self, key: int) -> TableEntry | None:
+        entry = self._read(key % self.size)
+        if entry is None or entry.key != key:
+            return None
+        return entry
+
+    def lookup(
+                self,
+                key: int,
+                depth: int,
+                alpha: float,
+                beta: float
+            ) -> float | None:
+        """
+        The stored value of a position if it can be used in place of
+        searching it to depth with the (alpha, beta) window
+        """
+        self.probes += 1
+
+        entry = self.probe(key)
+        if entry is None or entry.depth < depth:
+            return None
+
+        if (
+            entry.bound == Bound.EXACT or
+            (entry.bound == Bound.LOWER and entry.value >= beta) or
+            (entry.bound == Bound.UPPER and entry.value <= alpha)
+        ):
+            self.hits += 1
+            return entry.value
+
+        return None
+
+    def store(
+                self,
+                key: int,
+                depth: int,
+                value: float,
+                alpha: float,
+                beta: float,
+                best_move: int | None = None
+            ) -> None:
+        """
+        Stores the value found for a position searched with the
+        (alpha, beta) window, classifying it as an exact value or a bound
+        """
+        if value <= alpha:
+            bound = Bound.UPPER
+        elif value >= beta:
+            bound = Bound.LOWER
+        else:
+            bound = Bound.EXACT
+
+        index = key % self.size
+        current = self._read(index)
+
+        if (
+            self.policy == ReplacementPolicy.DEPTH_PREFERRED and
+            current is not None and
+            current.key != key and
+            current.generation == self.generation and
+            current.depth > depth
+        ):
+            return
+
+        self._write(index, TableEntry(
+            key, depth, value, bound, best_move, self.generation
+        ))
+
+    def __len__(self) -> int:
+        return sum(1 for entry in self.entries if entry is not None)
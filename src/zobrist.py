@@ -0,0 +1,58 @@
+from random import Random
+
+# A fixed seed keeps keys the same between runs and processes
+ZOBRIST_SEED = 4200
+
+class ZobristKeys:
+    """
+    Random 64-bit keys for every (piece, cell) pair and for the side to move
+
+    A position's key is the XOR of the keys of its pieces, plus the turn key
+    when O is to move, so it can be updated with one XOR per change
+    """
+
+    def __init__(self, cells: int, seed: int = ZOBRIST_SEED) -> None:
+        rng = Random(seed)
+
+        self.x_keys = [rng.getrandbits(64) for _ in range(cells)]
+        self.o_keys = [rng.getrandbits(64) for _ in range(cells)]
+        self.turn_key = rng.getrandbits(64)
+
+    def symmetric_keys(
+                self,
+                permutations: tuple[tuple[int, ...], ...]
+            ) -> tuple[list[tuple[int, ...]], list[tuple[int, ...]]]:
+        """
+        For every position, the X and O keys of the position each symmetry
+        sends it to, so the keys of all symmetric boards can be updated
+        together
+
+        The turn key is folded in, as every move also changes the turn
+        """
+        x_keys = [
+            tuple(
+                self.x_keys[permutation[position]] ^ self.turn_key
+                for permutation in permutations
+            )
+            for position in range(len(self.x_keys))
+        ]
+        o_keys = [
+            tuple(
+                self.o_keys[permutation[position]] ^ self.turn_key
+                for permutation in permutations
+            )
+            for position in range(len(self.o_keys))
+        ]
+        return x_keys, o_keys
+
+    def key_of(self, x_bits: int, o_bits: int, o_to_move: bool) -> int:
+        """Computes a key from scratch"""
+        key = self.turn_key if o_to_move else 0
+
+        for position, keys in ((x_bits, self.x_keys), (o_bits, self.o_keys)):
+            while position:
+                lowest = position & -position
+                key ^= keys[lowest.bit_length() - 1]
+                position ^= lowest
+
+        return key
@@ -0,0 +1,137 @@
+"""
+Checks of the endgame solver and the symmetry tables against slow, obvious
+versions of the same computation
+
+Run with `python -m pytest tests` from the repository root.
+"""
+from __future__ import annotations
+import sys
+from pathlib import Path
+from random import Random
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from piece import Piece
+from board import Board
+from bitboard import iterate_bits
+from endgame import EndgameSolver
+from symmetry import symmetry_permutations, transform_bits
+
+def random_position(rng: Random, pieces: int) -> Board | None:
+    """A position of random moves near the pieces, None if someone won"""
+    board = Board(rng.choice([Piece.X, Piece.O]))
+    for _ in range(pieces):
+        board.make_move(rng.choice(list(board.candidate_moves)))
+        if board.check_winners() != Piece.EMPTY:
+            return None
+    return board
+
+def endgame_position(rng: Random, empty: int) -> Board:
+    """
+    A random position with empty cells left where neither player can make
+    a line with the next move, so it takes a search to solve
+    """
+    while True:
+        board = Board(rng.choice([Piece.X, Piece.O]))
+        while board.count_empty() > empty:
+            quiet = []
+            for position in board.empty_squares:
+                board.make_move(position)
+                if not (
+                    board.evaluator.threat_cells(Piece.X, board.occupied) or
+                    board.evaluator.threat_cells(Piece.O, board.occupied)
+                ):
+                    quiet.append(position)
+                board.undo_move()
+            if not quiet:
+                break
+            board.make_move(rng.choice(quiet))
+        else:
+            return board
+
+def minimax(board: Board, values: dict[int, int]) -> int:
+    """The solver's value of the board by trying every move to the end"""
+    if board.key in values:
+        return values[board.key]
+    if board.check_winners() != Piece.EMPTY:
+        return -EndgameSolver.WIN_VALUE
+    if board.count_empty() == 0:
+        return 0
+
+    best = None
+    for position in list(board.empty_squares):
+        board.make_move(position)
+        value = EndgameSolver._parent_value(minimax(board, values))
+        board.undo_move()
+        best = value if best is None else max(best, value)
+
+    values[board.key] = best
+    return best
+
+def test_endgame_matches_minimax() -> None:
+    rng = Random(4200)
+    solver = EndgameSolver()
+
+    for _ in range(20):
+        board = endgame_position(rng, 8)
+        history = board.history.copy()
+
+        result = solver.solve(board)
+        assert result is not None
+        assert board.history == history
+
+        expected = minimax(board, {})
+        assert result.value == expected
+
+        # The solver's move keeps the value it promised
+        board.make_move(result.move)
+        assert EndgameSolver._parent_value(minimax(board, {})) == expected
+        board.undo_move()
+
+def test_transform_bits_matches_permutations() -> None:
+    rng = Random(4200)
+    permutations = symmetry_permutations(Board.DIMENSIONS)
+
+    for _ in range(50):
+        bits = rng.getrandbits(Board.DIMENSIONS * Board.DIMENSIONS)
+        for symmetry, permutation in enumerate(permutations):
+            expected = 0
+            for position in iterate_bits(bits):
+                expected |= 1 << permutation[position]
+            assert transform_bits(bits, symmetry, Board.DIMENSIONS) == expected
+
+def test_symmetric_keys_stay_incremental() -> None:
+    rng = Random(4200)
+
+    for _ in range(20):
+        board = random_position(rng, rng.randrange(1, Board.SYMMETRY_PIECES))
+        if board is None:
+            continue
+        assert board.symmetric_keys == board._compute_symmetric_keys()
+
+        board.undo_move()
+        assert board.symmetric_keys == board._compute_symmetric_keys()
+
+def test_symmetric_positions_share_a_canonical_key() -> None:
+    rng = Random(4200)
+    permutations = symmetry_permutations(Board.DIMENSIONS)
+
+    for _ in range(20):
+        board = random_position(rng, rng.randrange(1, Board.SYMMETRY_PIECES))
+        if board is None:
+            continue
+        key, symmetry = board.canonical()
+
+        for permutation in permutations:
+            mirrored = Board(board.order[0])
+            for position in board.history:
+                mirrored.make_move(permutation[position])
+            assert mirrored.canonical()[0] == key
+
+        for position in iterate_bits(board.occupied):
+            canonical = Board.to_canonical(position, symmetry)
+            assert Board.from_canonical(canonical, symmetry) == position
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))